@@ -1,73 +1,213 @@
-import logging
-from Crypto.Cipher import AES
-from config import AES_KEY, LOG_LEVEL
+import logging, hmac, hashlib, os
+from typing import Dict, List, Optional, Sequence, Union
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from metrics import timed
+from config import AES_KEY, AES_KEYS, AES_ACTIVE_KEY_ID, BLIND_INDEX_KEY
 
-logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-if AES_KEY is None:
+if AES_KEY is None and not AES_KEYS:
     raise ValueError("AES KEY is missing. Please check the environment variable.")
 
-try:
-    KEY = bytes.fromhex(AES_KEY)
-except ValueError:
-    raise ValueError("Invalid KEY format. It should be a valid hexadecimal string.")
+def _parse_key(hex_key: str, name: str) -> bytes:
+    try:
+        key = bytes.fromhex(hex_key)
+    except ValueError:
+        raise ValueError(f"Invalid {name} format. It should be a valid hexadecimal string.")
+    if len(key) != 32:
+        raise ValueError(f"{name} length is invalid. Expected 32 bytes, but got {len(key)} bytes.")
+    return key
+
+# Keyring for rotation: AES_KEYS holds "id:hexkey" pairs, and AES_KEY, when set, is key id 0 (the key of every
+# value written before key ids existed). New values are encrypted with AES_ACTIVE_KEY_ID, the highest id by
+# default; values under any key in the ring stay readable, and rotate_keys.py moves them onto the active key.
+# Once it has, a retired key (id 0 included) is dropped from the ring.
+def _parse_keyring(aes_key: Optional[str], aes_keys: Optional[str]) -> Dict[int, bytes]:
+    keys = {0: _parse_key(aes_key, "AES KEY")} if aes_key is not None else {}
+    listed = set()
+    for entry in filter(None, (part.strip() for part in (aes_keys or "").split(","))):
+        key_id_text, _, hex_key = entry.partition(":")
+        if not key_id_text.isdigit() or not 0 <= int(key_id_text) <= 255:
+            raise ValueError(f"Invalid AES KEYS entry '{key_id_text}'. Expected 'id:hexkey' with an id between 0 and 255.")
+        key_id = int(key_id_text)
+        if key_id in listed:
+            raise ValueError(f"AES KEYS lists key id {key_id} more than once.")
+        listed.add(key_id)
+        key = _parse_key(hex_key, f"AES KEYS entry {key_id}")
+        # Only id 0 can already be in the ring here, from AES_KEY
+        if key_id in keys and key != keys[key_id]:
+            raise ValueError("AES KEYS entry 0 must match AES KEY.")
+        keys[key_id] = key
+    return keys
+
+KEYS: Dict[int, bytes] = _parse_keyring(AES_KEY, AES_KEYS)
 
-if len(KEY) != 32:
-    raise ValueError(f"AES KEY length is invalid. Expected 32 bytes, but got {len(KEY)} bytes.")
-if not isinstance(KEY, bytes):
-    raise TypeError(f"AES KEY must be of type 'bytes', but got {type(KEY)}.")
+if not KEYS:
+    raise ValueError("AES KEYS has no entries. Expected 'id:hexkey' pairs.")
+ACTIVE_KEY_ID = AES_ACTIVE_KEY_ID if AES_ACTIVE_KEY_ID is not None else max(KEYS)
+if ACTIVE_KEY_ID not in KEYS:
+    raise ValueError(f"AES ACTIVE KEY ID {ACTIVE_KEY_ID} is not in the keyring.")
 
-def encrypt(data: str) -> str:
+# Blind index key is kept separate from the encryption key so indexes never reveal ciphertext material.
+# Single-key deployments derive it from AES_KEY; with a keyring it has to be explicit, so retiring a key never
+# changes it. Pinning the derived value keeps existing indexes valid; any other value needs
+# backfill_blind_index.py --reindex.
+if BLIND_INDEX_KEY is not None:
     try:
-        if data is None:
-            raise ValueError("Input is missing.")
-        if not isinstance(data, str):
-            raise TypeError("Input is not a string type.")
-        # Convert data to bytes
-        data_bytes = data.encode('utf-8')
-        block_size = AES.block_size
-
-        # Add PKCS#7 padding
-        padding_size = block_size - (len(data_bytes) % block_size)
-        padded_data = data_bytes + bytes([padding_size] * padding_size)
-
-        # Encrypt the data
-        cipher = AES.new(KEY, AES.MODE_CBC)  
-        iv = cipher.iv  # Initialization vector
-        encrypted_data = cipher.encrypt(padded_data)
-        # Return IV + encrypted data as a hex-encoded string
-    except Exception as e:
-        raise
-    return (iv + encrypted_data).hex()
-
-def decrypt(encrypted_data: str) -> str:
+        INDEX_KEY = bytes.fromhex(BLIND_INDEX_KEY)
+    except ValueError:
+        raise ValueError("Invalid BLIND INDEX KEY format. It should be a valid hexadecimal string.")
+    if len(INDEX_KEY) < 32:
+        raise ValueError(f"BLIND INDEX KEY length is invalid. Expected at least 32 bytes, but got {len(INDEX_KEY)} bytes.")
+elif AES_KEYS:
+    raise ValueError(
+        "BLIND INDEX KEY is missing. It is required with AES KEYS; set it to the value derived from AES KEY "
+        "(HMAC-SHA256 of 'blind-index' under AES KEY, hex) to keep existing blind indexes."
+    )
+else:
+    INDEX_KEY = hmac.new(KEYS[0], b"blind-index", hashlib.sha256).digest()
+
+# Ciphertext layout: VERSION_GCM_KEYED (1 byte) + key id (1 byte) + nonce (12 bytes) + AES-256-GCM ciphertext and tag.
+# Still readable: VERSION_GCM (1 byte) + nonce + ciphertext and tag under key id 0, and VERSION_CBC (1 byte) +
+# legacy AES-256-CBC under key id 0: IV (16 bytes) + PKCS#7 padded ciphertext. The version byte alone picks
+# the decryption; a GCM value that fails to authenticate is an error, never retried as CBC. Legacy CBC values
+# were stored without a version byte; classify_legacy marks them when migrations move them to binary columns.
+VERSION_CBC = 0x00
+VERSION_GCM = 0x01
+VERSION_GCM_KEYED = 0x02
+HEADER_CBC = bytes([VERSION_CBC])
+HEADER_GCM = bytes([VERSION_GCM])
+HEADER_GCM_KEYED = bytes([VERSION_GCM_KEYED])
+ACTIVE_HEADER = bytes([VERSION_GCM_KEYED, ACTIVE_KEY_ID])
+NONCE_SIZE = 12
+TAG_SIZE = 16
+BLOCK_SIZE = 16
+
+# The AEAD contexts hold the expanded keys and are safe to share between threads
+_aesgcm_by_id = {key_id: AESGCM(key) for key_id, key in KEYS.items()}
+_aesgcm = _aesgcm_by_id[ACTIVE_KEY_ID]
+_aes_algorithm = algorithms.AES(KEYS[0]) if 0 in KEYS else None
+
+def _legacy_key_check():
+    if 0 not in KEYS:
+        raise ValueError("Ciphertext uses AES key id 0, which is not in the keyring.")
+
+Token = Union[bytes, bytearray, memoryview, str]
+
+def _check_plaintext(data: str):
+    if data is None:
+        raise ValueError("Input is missing.")
+    if not isinstance(data, str):
+        raise TypeError("Input is not a string type.")
+
+def _to_bytes(encrypted_data: Token) -> bytes:
+    if encrypted_data is None:
+        raise ValueError("Input is missing.")
+    if isinstance(encrypted_data, str):
+        # Hex text as stored by the legacy String columns
+        return bytes.fromhex(encrypted_data)
+    if isinstance(encrypted_data, (bytes, bytearray, memoryview)):
+        return bytes(encrypted_data)
+    raise TypeError("Input must be bytes or a hex string.")
+
+def _decrypt_cbc(encrypted_bytes: bytes) -> bytes:
+    _legacy_key_check()
+    if len(encrypted_bytes) < 2 * BLOCK_SIZE or len(encrypted_bytes) % BLOCK_SIZE:
+        raise ValueError("Invalid ciphertext length.")
+    decryptor = Cipher(_aes_algorithm, modes.CBC(encrypted_bytes[:BLOCK_SIZE])).decryptor()
+    decrypted_padded_data = decryptor.update(encrypted_bytes[BLOCK_SIZE:]) + decryptor.finalize()
+    # Remove PKCS#7 padding
+    padding_size = decrypted_padded_data[-1]
+    if padding_size < 1 or padding_size > BLOCK_SIZE:
+        raise ValueError("Invalid padding size.")
+    return decrypted_padded_data[:-padding_size]
+
+def _decrypt_gcm(encrypted_bytes: bytes) -> bytes:
+    _legacy_key_check()
+    view = memoryview(encrypted_bytes)
     try:
-        if encrypted_data is None:
-            raise ValueError("Input is missing.")
-        if not isinstance(encrypted_data, str):
-            raise TypeError("Input must be a string.")
-
-        # Convert hex-encoded string back to bytes
-        encrypted_bytes = bytes.fromhex(encrypted_data)
-
-        block_size = AES.block_size
-        iv = encrypted_bytes[:block_size]  # Extract the IV (first block_size bytes)
-        encrypted_content = encrypted_bytes[block_size:]  # Extract the encrypted content
-
-        # Initialize the cipher for decryption
-        cipher = AES.new(KEY, AES.MODE_CBC, iv=iv)
-        decrypted_padded_data = cipher.decrypt(encrypted_content)
-
-        # Remove PKCS#7 padding
-        padding_size = decrypted_padded_data[-1]
-        if padding_size < 1 or padding_size > block_size:
-            raise ValueError("Invalid padding size.")
-        decrypted_data = decrypted_padded_data[:-padding_size]  # Remove padding
-
-        # Log the decrypted data
-        logger.info(f"Decrypted data: {decrypted_data.decode('utf-8')}")
-
-    except Exception as e:
-        raise
-    return decrypted_data.decode('utf-8')
+        return _aesgcm_by_id[0].decrypt(view[1:1 + NONCE_SIZE], view[1 + NONCE_SIZE:], None)
+    except InvalidTag:
+        raise ValueError("Ciphertext failed authentication.")
+
+def _decrypt_one(encrypted_bytes: bytes) -> bytes:
+    header = encrypted_bytes[:1]
+    view = memoryview(encrypted_bytes)
+    if header == HEADER_GCM_KEYED and len(encrypted_bytes) >= 2 + NONCE_SIZE + TAG_SIZE:
+        aesgcm = _aesgcm_by_id.get(encrypted_bytes[1])
+        if aesgcm is None:
+            raise ValueError(f"Ciphertext uses AES key id {encrypted_bytes[1]}, which is not in the keyring.")
+        try:
+            return aesgcm.decrypt(view[2:2 + NONCE_SIZE], view[2 + NONCE_SIZE:], None)
+        except InvalidTag:
+            raise ValueError("Ciphertext failed authentication.")
+    if header == HEADER_GCM and len(encrypted_bytes) >= 1 + NONCE_SIZE + TAG_SIZE:
+        return _decrypt_gcm(encrypted_bytes)
+    if header == HEADER_CBC and len(encrypted_bytes) % BLOCK_SIZE == 1:
+        return _decrypt_cbc(encrypted_bytes[1:])
+    raise ValueError("Unrecognized ciphertext format.")
+
+def classify_legacy(encrypted_data: Token) -> bytes:
+    # For migrations only: values written before VERSION_CBC existed can be headerless CBC, told apart from
+    # GCM by whether the tag authenticates. Returns the value in the current format; idempotent.
+    encrypted_bytes = _to_bytes(encrypted_data)
+    header = encrypted_bytes[:1]
+    view = memoryview(encrypted_bytes)
+    if header == HEADER_CBC and len(encrypted_bytes) % BLOCK_SIZE == 1:
+        return encrypted_bytes
+    if header == HEADER_GCM_KEYED and len(encrypted_bytes) >= 2 + NONCE_SIZE + TAG_SIZE and encrypted_bytes[1] in _aesgcm_by_id:
+        try:
+            _aesgcm_by_id[encrypted_bytes[1]].decrypt(view[2:2 + NONCE_SIZE], view[2 + NONCE_SIZE:], None)
+            return encrypted_bytes
+        except InvalidTag:
+            pass
+    elif header == HEADER_GCM and len(encrypted_bytes) >= 1 + NONCE_SIZE + TAG_SIZE and 0 in _aesgcm_by_id:
+        try:
+            _aesgcm_by_id[0].decrypt(view[1:1 + NONCE_SIZE], view[1 + NONCE_SIZE:], None)
+            return encrypted_bytes
+        except InvalidTag:
+            pass
+    # Raises unless the value is well-formed CBC under key id 0
+    _decrypt_cbc(encrypted_bytes)
+    return HEADER_CBC + encrypted_bytes
+
+def key_id(encrypted_data: Token) -> int:
+    # Key id a value is encrypted under; values written before key ids existed are under key id 0
+    encrypted_bytes = _to_bytes(encrypted_data)
+    if encrypted_bytes[:1] == HEADER_GCM_KEYED and len(encrypted_bytes) >= 2 + NONCE_SIZE + TAG_SIZE:
+        return encrypted_bytes[1]
+    return 0
+
+def needs_rotation(encrypted_data: Token) -> bool:
+    # True for anything not in the current format under the active key, legacy layouts included
+    return _to_bytes(encrypted_data)[:2] != ACTIVE_HEADER
+
+def encrypt_many(values: Sequence[str]) -> List[bytes]:
+    for data in values:
+        _check_plaintext(data)
+    with timed("crypto"):
+        # One urandom call supplies every nonce in the batch
+        nonces = os.urandom(NONCE_SIZE * len(values))
+        aead_encrypt = _aesgcm.encrypt
+        result = []
+        for position, data in enumerate(values):
+            nonce = nonces[position * NONCE_SIZE:(position + 1) * NONCE_SIZE]
+            result.append(b"".join((ACTIVE_HEADER, nonce, aead_encrypt(nonce, data.encode('utf-8'), None))))
+    return result
+
+def decrypt_many(values: Sequence[Token]) -> List[str]:
+    with timed("crypto"):
+        return [_decrypt_one(_to_bytes(encrypted_data)).decode('utf-8') for encrypted_data in values]
+
+def encrypt(data: str) -> bytes:
+    return encrypt_many([data])[0]
+
+def blind_index(data: str) -> str:
+    # Deterministic keyed hash of the plaintext, used for equality lookups on encrypted columns
+    _check_plaintext(data)
+    return hmac.new(INDEX_KEY, data.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def decrypt(encrypted_data: Token) -> str:
+    return decrypt_many([encrypted_data])[0]
@@ -0,0 +1,142 @@
+import asyncio, heapq, itertools, logging
+from typing import AsyncIterator, Iterator, List
+from fastapi import Depends, HTTPException, Request
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from database import get_db, get_read_db, async_session_scope, mark_write, pinned_to_primary, POOL_SIZE, MAX_OVERFLOW
+from metrics import Gauge, register
+from config import ADMISSION_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER, INGEST_MODE
+
+logger = logging.getLogger(__name__)
+
+# Lower value is admitted first; exports wait behind every request
+READ, WRITE, EXPORT = 0, 1, 2
+
+class AdmissionController:
+    # Caps requests holding a database session at what the pool can serve. Waiting happens on the event
+    # loop, so a saturated pool no longer ties up threadpool threads blocked in connection checkout.
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float, retry_after: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        # (priority, arrival, future); entries whose waiter gave up stay until popped and are skipped
+        self._waiters: List[tuple] = []
+        self._arrivals = itertools.count()
+
+    def busy(self) -> HTTPException:
+        return HTTPException(status_code=503, detail="Server is busy, retry later.", headers={"Retry-After": str(self.retry_after)})
+
+    async def acquire(self, priority: int):
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+            return
+        if self.queued >= self.queue_size:
+            self.rejected_full += 1
+            raise self.busy()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+        self.queued += 1
+        try:
+            # A slot handed over by release() resolves the future; in_flight already counts it
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queued -= 1
+            self.rejected_timeout += 1
+            raise self.busy()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self.queued -= 1
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.queued -= 1
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout
+        }
+
+def default_limit() -> int:
+    # One pooled connection is left to the ingest batcher when it runs
+    capacity = POOL_SIZE + MAX_OVERFLOW
+    return max(1, capacity - 1) if INGEST_MODE == "queue" else capacity
+
+admission = AdmissionController(ADMISSION_LIMIT or default_limit(), ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER)
+register(Gauge("admission_requests", "Admission control slots, waiters and rejections.",
+               lambda: {(name,): value for name, value in admission.stats().items()}, ["state"]))
+
+async def admit_read():
+    await admission.acquire(READ)
+    try:
+        yield
+    finally:
+        admission.release()
+
+async def admit_write():
+    await admission.acquire(WRITE)
+    try:
+        yield
+    finally:
+        admission.release()
+
+class AdmissionSlot:
+    # A slot held past the request, released once by whichever runs first: the stream's finally or the
+    # response's background task (the only one that runs when the client disconnects before the body starts)
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release()
+
+async def admit_export() -> AdmissionSlot:
+    await admission.acquire(EXPORT)
+    return AdmissionSlot(admission)
+
+async def admitted_stream(chunks: Iterator[str], slot: AdmissionSlot) -> AsyncIterator[str]:
+    # Runs a blocking export generator in the threadpool and holds the slot, like its session, until it ends
+    try:
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+        finally:
+            # Closes the generator's session when the client went away mid-stream
+            await run_in_threadpool(chunks.close)
+    finally:
+        slot.release()
+
+# Session dependencies for routes: the slot is taken before the session, and given back after it closes.
+# Reads go to a replica when configured, writes to the primary.
+def get_db_for_read(request: Request, _=Depends(admit_read)):
+    yield from get_read_db(pinned_to_primary(request))
+
+def get_db_for_write(request: Request, _=Depends(admit_write)):
+    mark_write(request)
+    yield from get_db()
+
+async def get_async_db_for_read(request: Request, _=Depends(admit_read)):
+    async with async_session_scope(use_replica=not pinned_to_primary(request)) as db:
+        yield db
+
+async def get_async_db_for_write(request: Request, _=Depends(admit_write)):
+    mark_write(request)
+    async with async_session_scope(use_replica=False) as db:
+        yield db
@@ -0,0 +1,127 @@
+import json, logging, os, struct, threading, zlib
+from typing import Dict, List, Optional, Tuple
+from AES import decrypt_many
+from metrics import Gauge, register
+from config import ARCHIVE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Cold records moved out of the hot tables by archive_records.py. A segment is written once and never
+# modified: segment-NNNNNN.seg holds one entry per record (4-byte big-endian length + zlib-compressed JSON
+# get_info response), segment-NNNNNN.idx maps eid -> [offset, length] of its entry. The pageURL/pageID
+# values stay the stored AES ciphertext (hex), so an archive holds no more plaintext than the tables did;
+# keep a retired AES key in AES_KEYS for as long as segments written under it are kept.
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+LENGTH = struct.Struct(">I")
+
+def segment_name(number: int) -> str:
+    return f"segment-{number:06d}"
+
+def next_segment_number(path: str) -> int:
+    numbers = [int(name[8:14]) for name in os.listdir(path) if name.startswith("segment-") and name.endswith(INDEX_SUFFIX)]
+    return max(numbers, default=0) + 1
+
+def write_segment(path: str, entries: List[Tuple[str, dict]]) -> str:
+    # Both files are written under a temporary name, flushed to disk and renamed; readers only pick up
+    # a segment once its index exists, so a crash never exposes a partial segment
+    os.makedirs(path, exist_ok=True)
+    name = segment_name(next_segment_number(path))
+    segment_path = os.path.join(path, name + SEGMENT_SUFFIX)
+    index_path = os.path.join(path, name + INDEX_SUFFIX)
+    index: Dict[str, List[int]] = {}
+    with open(segment_path + ".tmp", "wb") as segment:
+        offset = 0
+        for eid, response_data in entries:
+            payload = zlib.compress(json.dumps(response_data, separators=(",", ":")).encode("utf-8"))
+            segment.write(LENGTH.pack(len(payload)))
+            segment.write(payload)
+            index[eid] = [offset + LENGTH.size, len(payload)]
+            offset += LENGTH.size + len(payload)
+        segment.flush()
+        os.fsync(segment.fileno())
+    os.replace(segment_path + ".tmp", segment_path)
+    with open(index_path + ".tmp", "w") as index_file:
+        json.dump(index, index_file, separators=(",", ":"))
+        index_file.flush()
+        os.fsync(index_file.fileno())
+    os.replace(index_path + ".tmp", index_path)
+    logger.info("Wrote archive segment %s with %d records (%d bytes)", name, len(entries), offset)
+    return name
+
+class RecordArchive:
+    # Read side, shared by the threads of one worker. Indexes of every segment are held in memory
+    # (eid -> segment, offset, length); an entry is read with a single pread.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[str, int, int]] = {}
+        self._files: Dict[str, int] = {}
+        self._loaded_segments = set()
+        self._directory_mtime = None
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self):
+        # Picks up segments written since the last call; a stat of the directory when nothing changed
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._directory_mtime:
+            return
+        with self._lock:
+            for name in sorted(os.listdir(self.path)):
+                segment = name[:-len(INDEX_SUFFIX)]
+                if not name.endswith(INDEX_SUFFIX) or segment in self._loaded_segments:
+                    continue
+                with open(os.path.join(self.path, name)) as index_file:
+                    index = json.load(index_file)
+                # Later segments win if a record was archived twice (a crash between writing and deleting)
+                self._index.update((eid, (segment, offset, length)) for eid, (offset, length) in index.items())
+                self._loaded_segments.add(segment)
+                logger.info("Loaded archive segment %s (%d records)", segment, len(index))
+            self._directory_mtime = mtime
+
+    def _file(self, segment: str) -> int:
+        descriptor = self._files.get(segment)
+        if descriptor is None:
+            with self._lock:
+                descriptor = self._files.get(segment)
+                if descriptor is None:
+                    descriptor = self._files[segment] = os.open(os.path.join(self.path, segment + SEGMENT_SUFFIX), os.O_RDONLY)
+        return descriptor
+
+    def get(self, eid: str) -> Optional[dict]:
+        self.refresh()
+        location = self._index.get(eid)
+        if location is None:
+            self.misses += 1
+            return None
+        segment, offset, length = location
+        response_data = json.loads(zlib.decompress(os.pread(self._file(segment), length, offset)))
+        social_media = list(response_data["Social Media Info"].values())
+        plaintexts = iter(decrypt_many([value for entry in social_media for value in (entry["pageURL"], entry["pageID"])]))
+        for entry in social_media:
+            entry["pageURL"] = next(plaintexts)
+            entry["pageID"] = next(plaintexts)
+        self.hits += 1
+        return response_data
+
+    def eids(self) -> List[str]:
+        self.refresh()
+        return list(self._index)
+
+    def stats(self) -> Dict[str, int]:
+        return {"segments": len(self._loaded_segments), "records": len(self._index), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            for descriptor in self._files.values():
+                os.close(descriptor)
+            self._files.clear()
+
+record_archive = RecordArchive(ARCHIVE_PATH) if ARCHIVE_PATH else None
+if record_archive is not None:
+    register(Gauge("record_archive", "Archived record segments, records and lookup outcomes.",
+                   lambda: {(name,): value for name, value in record_archive.stats().items()}, ["state"]))
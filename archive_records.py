@@ -0,0 +1,141 @@
+import argparse, logging
+from typing import List
+from sqlalchemy import delete, insert, select
+from database import SessionLocal
+from models import PersonalInfo, HotelInfo, AgencyInfo, SocialMediaInfo, RecordDocument, ArchivedRecord, ArchivedPage
+from services import build_info
+from statements import RECORD_GRAPH_BATCH_OPTIONS
+from archive import RecordArchive, write_segment
+from AES import blind_index
+from logging_setup import setup_logging
+from config import ARCHIVE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Moves record graphs out of the hot tables into archive segments, one segment and one transaction per batch.
+# Records carry no timestamp, so age is the insertion order: --before-pid archives every record with a lower
+# pid. Inactive records are named explicitly with --eid / --eids-file. The segment is on disk before the rows
+# are deleted, so a crash in between leaves the record in both places (the hot copy is served) and a rerun
+# archives it again. The unique values of deleted rows move to the archived_record/archived_page tombstones in
+# the same transaction, so a new record cannot reuse an archived eid, email, phone or page; on PostgreSQL,
+# VACUUM returns the space. --tombstones rebuilds the tombstones from the segments (archives written before
+# they existed, or after backfill_blind_index.py --reindex).
+def archive_entry(personal_info: PersonalInfo) -> dict:
+    # The get_info response with pageURL/pageID left as their stored ciphertext
+    ciphertext_info = {
+        smi.plid: {"pageURL": bytes(smi.pageURL).hex(), "pageID": bytes(smi.pageID).hex()}
+        for smi in personal_info.hotel_info.social_media_info
+    }
+    return build_info(personal_info, ciphertext_info)
+
+def archive_batch(path: str, personal_infos: List[PersonalInfo], db) -> int:
+    # Incomplete graphs 404 on get_info, so they stay where they are
+    complete = [
+        personal_info for personal_info in personal_infos
+        if personal_info.hotel_info and personal_info.hotel_info.social_media_info
+    ]
+    if not complete:
+        return 0
+    write_segment(path, [(personal_info.eid, archive_entry(personal_info)) for personal_info in complete])
+
+    db.execute(insert(ArchivedRecord), [
+        {"eid": personal_info.eid, "personal_email": personal_info.personal_email, "personal_phone": personal_info.personal_phone}
+        for personal_info in complete
+    ])
+    db.execute(insert(ArchivedPage), [
+        {"eid": personal_info.eid, "pageURL_bidx": smi.pageURL_bidx, "pageID_bidx": smi.pageID_bidx}
+        for personal_info in complete for smi in personal_info.hotel_info.social_media_info
+    ])
+    hids = [personal_info.hotel_info.hid for personal_info in complete]
+    db.execute(delete(SocialMediaInfo).where(SocialMediaInfo.hid.in_(hids)))
+    db.execute(delete(AgencyInfo).where(AgencyInfo.hid.in_(hids)))
+    db.execute(delete(HotelInfo).where(HotelInfo.hid.in_(hids)))
+    db.execute(delete(RecordDocument).where(RecordDocument.eid.in_([personal_info.eid for personal_info in complete])))
+    db.execute(delete(PersonalInfo).where(PersonalInfo.pid.in_([personal_info.pid for personal_info in complete])))
+    db.commit()
+    return len(complete)
+
+def archive_before(path: str, before_pid: int, batch_size: int = 1000) -> int:
+    last_pid = 0
+    archived = 0
+    while True:
+        with SessionLocal() as db:
+            personal_infos = db.execute(
+                select(PersonalInfo)
+                .options(*RECORD_GRAPH_BATCH_OPTIONS)
+                .where(PersonalInfo.pid > last_pid, PersonalInfo.pid < before_pid)
+                .order_by(PersonalInfo.pid)
+                .limit(batch_size)
+            ).scalars().all()
+            if not personal_infos:
+                break
+            archived += archive_batch(path, personal_infos, db)
+        last_pid = personal_infos[-1].pid
+        logger.info("Archived records up to pid %s (%d so far)", last_pid, archived)
+    return archived
+
+def archive_eids(path: str, eids: List[str], batch_size: int = 1000) -> int:
+    archived = 0
+    for start in range(0, len(eids), batch_size):
+        with SessionLocal() as db:
+            personal_infos = db.execute(
+                select(PersonalInfo).options(*RECORD_GRAPH_BATCH_OPTIONS).where(PersonalInfo.eid.in_(eids[start:start + batch_size]))
+            ).scalars().all()
+            archived += archive_batch(path, personal_infos, db)
+        logger.info("Archived %d of %d listed records so far", archived, len(eids))
+    return archived
+
+def rebuild_tombstones(path: str, batch_size: int = 1000) -> int:
+    # Replaces every tombstone in one transaction, with page blind indexes under the current BLIND_INDEX_KEY
+    record_archive = RecordArchive(path)
+    eids = record_archive.eids()
+    with SessionLocal() as db:
+        db.execute(delete(ArchivedPage))
+        db.execute(delete(ArchivedRecord))
+        for start in range(0, len(eids), batch_size):
+            entries = [(eid, record_archive.get(eid)) for eid in eids[start:start + batch_size]]
+            db.execute(insert(ArchivedRecord), [
+                {
+                    "eid": eid,
+                    "personal_email": response_data["Personal Info"]["personal_email"],
+                    "personal_phone": response_data["Personal Info"]["personal_phone"]
+                }
+                for eid, response_data in entries
+            ])
+            db.execute(insert(ArchivedPage), [
+                {"eid": eid, "pageURL_bidx": blind_index(page["pageURL"]), "pageID_bidx": blind_index(page["pageID"])}
+                for eid, response_data in entries for page in response_data["Social Media Info"].values()
+            ])
+            logger.info("Rebuilt tombstones for %d of %d archived records", start + len(entries), len(eids))
+        db.commit()
+    record_archive.close()
+    return len(eids)
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Move cold records from the database into archive segments.")
+    parser.add_argument("--path", default=ARCHIVE_PATH, help="Archive directory (defaults to ARCHIVE_PATH)")
+    parser.add_argument("--before-pid", type=int, default=None, help="Archive every record with a lower pid")
+    parser.add_argument("--eid", action="append", default=None, help="Archive this record (repeatable)")
+    parser.add_argument("--eids-file", default=None, help="File with one eid per line to archive")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per segment and transaction")
+    parser.add_argument("--tombstones", action="store_true", help="Rebuild the tombstones of every archived record")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("Set ARCHIVE_PATH or pass --path.")
+    eids = args.eid
+    if args.eids_file:
+        with open(args.eids_file) as eids_file:
+            eids = (eids or []) + [line.strip() for line in eids_file if line.strip()]
+    if args.tombstones:
+        count = rebuild_tombstones(args.path, args.batch_size)
+        logger.info("Tombstones rebuilt for %d archived records", count)
+        raise SystemExit(0)
+    if args.before_pid is None and eids is None:
+        parser.error("Pass --before-pid, --eid, --eids-file or --tombstones.")
+    count = 0
+    if args.before_pid is not None:
+        count += archive_before(args.path, args.before_pid, args.batch_size)
+    if eids:
+        count += archive_eids(args.path, eids, args.batch_size)
+    logger.info("Archival completed: %d records moved to %s", count, args.path)
@@ -0,0 +1,85 @@
+import argparse, logging
+from sqlalchemy import inspect, select, text, update, or_
+from sqlalchemy.exc import IntegrityError
+from database import engine, SessionLocal
+from models import SocialMediaInfo
+from AES import decrypt_many, blind_index
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+BLIND_INDEX_COLUMNS = ["pageURL_bidx", "pageID_bidx"]
+
+# Adds the blind index columns and their unique indexes to a social_media_info table created before they existed
+def ensure_blind_index_columns():
+    table = SocialMediaInfo.__table__
+    existing_columns = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as connection:
+        for column_name in BLIND_INDEX_COLUMNS:
+            if column_name not in existing_columns:
+                logger.info("Adding column %s.%s...", table.name, column_name)
+                column_type = table.c[column_name].type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column_name}" {column_type}'))
+        for index in table.indexes:
+            if {column.name for column in index.columns} & set(BLIND_INDEX_COLUMNS):
+                index.create(bind=connection, checkfirst=True)
+
+def backfill_row(db, row) -> bool:
+    try:
+        with db.begin_nested():
+            db.execute(update(SocialMediaInfo), [row])
+        return True
+    except IntegrityError:
+        logger.error("Duplicate page URL/ID for sid %s; leaving its blind index empty", row["sid"])
+        return False
+
+# Walks social_media_info in sid order and fills missing blind indexes, committing once per batch. With
+# reindex every row is recomputed, for a new BLIND_INDEX_KEY; until it finishes, duplicate checks miss the rows
+# still indexed under the old key, so run it with writes paused. Archive tombstones are rebuilt afterwards
+# with archive_records.py --tombstones.
+def backfill_blind_index(batch_size: int = 1000, reindex: bool = False) -> int:
+    last_sid = 0
+    updated = 0
+    while True:
+        with SessionLocal() as db:
+            statement = (
+                select(SocialMediaInfo.sid, SocialMediaInfo.pageURL, SocialMediaInfo.pageID)
+                .where(SocialMediaInfo.sid > last_sid)
+                .order_by(SocialMediaInfo.sid)
+                .limit(batch_size)
+            )
+            if not reindex:
+                statement = statement.where(or_(SocialMediaInfo.pageURL_bidx.is_(None), SocialMediaInfo.pageID_bidx.is_(None)))
+            rows = db.execute(statement).all()
+            if not rows:
+                break
+            plaintexts = decrypt_many([token for row in rows for token in (row.pageURL, row.pageID)])
+            batch = [
+                {
+                    "sid": row.sid,
+                    "pageURL_bidx": blind_index(plaintexts[2 * position]),
+                    "pageID_bidx": blind_index(plaintexts[2 * position + 1])
+                }
+                for position, row in enumerate(rows)
+            ]
+            try:
+                with db.begin_nested():
+                    db.execute(update(SocialMediaInfo), batch)
+                updated += len(batch)
+            except IntegrityError:
+                # Pre-existing duplicates make the batch fail; redo it row by row so only they are skipped
+                updated += sum(backfill_row(db, row) for row in batch)
+            db.commit()
+            last_sid = rows[-1].sid
+            logger.info("Backfilled blind indexes up to sid %s (%d rows so far)", last_sid, updated)
+    return updated
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Compute blind indexes for existing SocialMediaInfo rows.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows updated per transaction")
+    parser.add_argument("--reindex", action="store_true", help="Recompute every blind index, not only missing ones")
+    args = parser.parse_args()
+    ensure_blind_index_columns()
+    count = backfill_blind_index(args.batch_size, args.reindex)
+    logger.info("Blind index backfill completed: %d rows updated", count)
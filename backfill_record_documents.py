@@ -0,0 +1,49 @@
+import argparse, logging
+from sqlalchemy import select
+from database import engine, SessionLocal
+from models import PersonalInfo, RecordDocument
+from AES import encrypt_many
+from services import build_info, dumps
+from statements import RECORD_GRAPH_BATCH_OPTIONS
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Creates the record_document table on an existing database and writes documents for records that
+# predate RECORD_DOCUMENTS. Resumable: only records without a document are visited, in pid order.
+def backfill_record_documents(batch_size: int = 500) -> int:
+    RecordDocument.__table__.create(bind=engine, checkfirst=True)
+    last_pid = 0
+    written = 0
+    while True:
+        with SessionLocal() as db:
+            personal_infos = db.execute(
+                select(PersonalInfo)
+                .options(*RECORD_GRAPH_BATCH_OPTIONS)
+                .where(PersonalInfo.pid > last_pid)
+                .where(~select(RecordDocument.eid).where(RecordDocument.eid == PersonalInfo.eid).exists())
+                .order_by(PersonalInfo.pid)
+                .limit(batch_size)
+            ).scalars().all()
+            if not personal_infos:
+                break
+            # Incomplete graphs 404 on get_info as well, so they get no document
+            complete = [
+                personal_info for personal_info in personal_infos
+                if personal_info.hotel_info and personal_info.hotel_info.social_media_info
+            ]
+            documents = encrypt_many([dumps(build_info(personal_info)) for personal_info in complete])
+            db.add_all(RecordDocument(eid=personal_info.eid, document=document) for personal_info, document in zip(complete, documents))
+            db.commit()
+            last_pid = personal_infos[-1].pid
+        written += len(complete)
+        logger.info("Wrote record documents up to pid %s (%d so far)", last_pid, written)
+    return written
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Write record documents for records that do not have one.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Records per transaction")
+    args = parser.parse_args()
+    count = backfill_record_documents(args.batch_size)
+    logger.info("Record document backfill completed: %d documents written", count)
@@ -0,0 +1,91 @@
+import logging, random, time
+from typing import Iterator
+from platform_table import platforms
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ["Ava", "Liam", "Mia", "Noah", "Zoe", "Ethan", "Ivy", "Lucas", "Aria", "Mason"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Kim", "Nguyen", "Brown", "Lopez", "Khan", "Silva"]
+TITLES = ["General Manager", "Director of Sales", "Marketing Manager", "Front Office Manager"]
+LOCATIONS = [
+    ("USA", "California", "San Francisco"), ("USA", "New York", "New York"), ("USA", "Texas", "Austin"),
+    ("Canada", "Ontario", "Toronto"), ("Mexico", "Jalisco", "Guadalajara"), ("UK", "England", "London")
+]
+# "Other"/"I don't know" are left out so every generated page maps onto a real platform
+SOCIAL_PLATFORMS = [name for name in platforms if name not in ("Other", "I don't know")]
+
+def generate_record(number: int, rng: random.Random) -> dict:
+    # Every unique field is derived from the record number, so any range of numbers never collides
+    country, state, city = rng.choice(LOCATIONS)
+    not_applicable = rng.random() < 0.3
+    platform_inputs = {}
+    for platform_name in rng.sample(SOCIAL_PLATFORMS, rng.randint(1, 3)):
+        slug = platform_name.lower()
+        mi_fbm = rng.random() < 0.5
+        platform_inputs[platform_name] = {
+            "sma_name": f"Agency {number % 500}",
+            "sma_person": rng.choice(FIRST_NAMES),
+            "sma_email": f"sma{number}@agency.com",
+            "sma_phone": f"{(number * 7) % 10**10:010d}",
+            "pageURL": f"https://www.{slug}.com/hotel{number}",
+            "pageID": f"{slug}-{number}",
+            "mi_fbm": mi_fbm,
+            "added_dcube": None if mi_fbm else rng.random() < 0.5
+        }
+    record = {
+        "first_name": rng.choice(FIRST_NAMES),
+        "last_name": rng.choice(LAST_NAMES),
+        "title": rng.choice(TITLES),
+        "personal_email": f"employee{number}@hotel.com",
+        "eid": f"EID{number:08d}",
+        "country_code": "+1",
+        "personal_phone": f"{number:010d}",
+        "hotel_name": f"Hotel {number}",
+        "marsha_code": f"M{number:07d}",
+        "managed_franchise": rng.choice(["Managed", "Franchise"]),
+        "country": country,
+        "state": state,
+        "city": city,
+        "zip_code": 10000 + number % 89999,
+        "not_applicable": not_applicable,
+        "platform_inputs": platform_inputs
+    }
+    if not not_applicable:
+        record.update({
+            "agency_name": f"Agency {number % 500}",
+            "primary_contact": rng.choice(FIRST_NAMES),
+            "primary_email": f"agency{number % 500}@agency.com",
+            "primary_phone": f"{(number * 3) % 10**10:010d}"
+        })
+    return record
+
+def generate_records(count: int, start: int = 1, seed: int = 42) -> Iterator[dict]:
+    rng = random.Random(seed + start)
+    for number in range(start, start + count):
+        yield generate_record(number, rng)
+
+def eid_for(number: int) -> str:
+    return f"EID{number:08d}"
+
+def seed_database(count: int, start: int = 1, batch_size: int = 1000) -> int:
+    # Uses the bulk insert path, one transaction per batch
+    from database import SessionLocal
+    from services import post_info_bulk
+    inserted = 0
+    started = time.perf_counter()
+    batch = []
+    for record in generate_records(count, start):
+        batch.append(record)
+        if len(batch) == batch_size:
+            inserted += seed_batch(batch, SessionLocal, post_info_bulk)
+            batch = []
+            logger.info("Seeded %d/%d records (%.0f records/s)", inserted, count, inserted / (time.perf_counter() - started))
+    if batch:
+        inserted += seed_batch(batch, SessionLocal, post_info_bulk)
+    return inserted
+
+def seed_batch(batch: list, session_factory, post_info_bulk) -> int:
+    with session_factory() as db:
+        result = post_info_bulk(batch, db)
+        db.commit()
+    return result["inserted"]
@@ -0,0 +1,237 @@
+import argparse, asyncio, json, logging, os, platform, random, statistics, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+# Runs entirely in-process: requests are sent straight to the ASGI app, so no server or external
+# service is needed. SQLite is used unless BENCH_DATABASE_URL points at a (local) PostgreSQL.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def configure_environment(args):
+    # Must run before any application module is imported, since config.py reads the environment at import
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SQLALCHEMY_POOL_SIZE", "10")
+    os.environ.setdefault("SQLALCHEMY_MAX_OVERFLOW", "10")
+    os.environ.setdefault("AES_KEY", "00" * 32)
+    os.environ.setdefault("HOST", "127.0.0.1")
+    os.environ.setdefault("PORT", "8000")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["DB_MODE"] = args.db_mode
+    # Cache disabled by default so the numbers reflect the database path
+    os.environ["INFO_CACHE_BACKEND"] = "memory" if args.with_cache else "none"
+    sys.path.insert(0, ROOT)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    return {
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+class StatementCounter:
+    # Counts SQL statements on the sync engine and, in async mode, on the async engine's sync core
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._increment)
+
+    def _increment(self, *args):
+        self.count += 1
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+    # Minimal ASGI client: enough for JSON requests against FastAPI routes
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80)
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status, chunks = 0, []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+async def bench_endpoint(app, counter: StatementCounter, requests: List[Tuple[str, str, bytes]], concurrency: int, expected: int) -> dict:
+    latencies, errors = [], 0
+    queue = list(reversed(requests))
+    statements_before = counter.count
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, path, body = queue.pop()
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, body)
+            latencies.append(time.perf_counter() - started)
+            if status != expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "concurrency": concurrency,
+        "requests_per_second": round(len(requests) / elapsed, 1),
+        "statements_per_request": round((counter.count - statements_before) / len(requests), 2),
+        **percentiles(latencies)
+    }
+
+def bench_callable(function: Callable, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - started)
+    return {"iterations": iterations, "ops_per_second": round(iterations / sum(latencies), 1), **percentiles(latencies)}
+
+def bench_crypto(iterations: int) -> dict:
+    from AES import encrypt, decrypt, encrypt_many, decrypt_many
+    value = "https://www.facebook.com/hotel0000001"
+    token = encrypt(value)
+    batch = [value] * 100
+    tokens = encrypt_many(batch)
+    return {
+        "encrypt": bench_callable(lambda: encrypt(value), iterations),
+        "decrypt": bench_callable(lambda: decrypt(token), iterations),
+        "encrypt_many_100": bench_callable(lambda: encrypt_many(batch), max(1, iterations // 100)),
+        "decrypt_many_100": bench_callable(lambda: decrypt_many(tokens), max(1, iterations // 100))
+    }
+
+def bench_validation(iterations: int) -> dict:
+    # Per-payload cost of the Create validator, for a valid payload and one failing every rule group
+    from fastapi import HTTPException
+    from schema import Create, validate_many
+    from benchmarks.datagen import generate_records
+    records = list(generate_records(100))
+    invalid = {**records[0], "personal_email": "invalid", "personal_phone": "1", "hotel_name": "", "not_applicable": False,
+               "agency_name": None, "platform_inputs": {"Facebook": {"pageURL": "http://invalid", "mi_fbm": None}}}
+
+    def validate_invalid():
+        try:
+            Create.model_validate(invalid)
+        except HTTPException:
+            pass
+
+    return {
+        "valid": bench_callable(lambda: Create.model_validate(records[0]), iterations),
+        "invalid": bench_callable(validate_invalid, iterations),
+        "validate_many_100": bench_callable(lambda: validate_many(records), max(1, iterations // 100))
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run_http_benchmarks(args, seeded: int) -> dict:
+    import main
+    from database import engine, async_engine
+    from benchmarks.datagen import generate_records, eid_for
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    counter = StatementCounter(engines)
+    rng = random.Random(7)
+
+    async with main.lifespan(main.app):
+        inputs = [
+            ("POST", "/info_input", json.dumps(record).encode())
+            for record in generate_records(args.requests, start=seeded + 1, seed=args.seed + 1)
+        ]
+        outputs = [("GET", f"/info_output/{eid_for(rng.randint(1, seeded))}", b"") for _ in range(args.requests)]
+        # Warm up connections, the platform registry and code paths before measuring
+        for method, path, body in outputs[:min(20, len(outputs))]:
+            await asgi_request(main.app, method, path, body)
+        return {
+            "info_input": await bench_endpoint(main.app, counter, inputs, args.concurrency, 201),
+            "info_output": await bench_endpoint(main.app, counter, outputs, args.concurrency, 200),
+            # Keyset pages should cost the same at the start and at the end of the table
+            "hotels_first_page": await bench_endpoint(main.app, counter, [("GET", "/hotels?limit=50", b"")] * args.requests, args.concurrency, 200),
+            "hotels_last_page": await bench_endpoint(
+                main.app, counter, [("GET", f"/hotels?limit=50&cursor={max(0, seeded - 50)}", b"")] * args.requests, args.concurrency, 200
+            )
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark post_info/get_info throughput, latency and query counts.")
+    parser.add_argument("--records", type=int, default=10000, help="Records seeded before measuring (10k to 10M)")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests sent per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent in-flight requests")
+    parser.add_argument("--crypto-iterations", type=int, default=20000)
+    parser.add_argument("--validation-iterations", type=int, default=20000)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Defaults to a fresh SQLite file; point at a local PostgreSQL to benchmark it instead")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the info cache enabled")
+    parser.add_argument("--reuse", action="store_true", help="Skip seeding and reuse the existing database contents")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    fresh_sqlite = args.database_url is None
+    if fresh_sqlite:
+        path = os.path.join(tempfile.gettempdir(), "data_collection_bench.db")
+        if os.path.exists(path) and not args.reuse:
+            os.remove(path)
+        args.database_url = f"sqlite:///{path}"
+    configure_environment(args)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logging.getLogger("benchmarks").setLevel(logging.INFO)
+
+    from database import create_tables, engine
+    from platform_table import populate_platform_info
+    from benchmarks.datagen import seed_database
+    create_tables()
+    populate_platform_info()
+
+    seed_started = time.perf_counter()
+    if args.reuse:
+        from sqlalchemy import func, select
+        from models import PersonalInfo
+        with engine.connect() as connection:
+            seeded = connection.execute(select(func.count()).select_from(PersonalInfo)).scalar()
+    else:
+        seeded = seed_database(args.records)
+    seed_seconds = time.perf_counter() - seed_started
+    if not seeded:
+        parser.error("The database holds no records to read back; seed it first.")
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "db_mode": args.db_mode,
+            "cache": args.with_cache,
+            "records": seeded,
+            "seed_seconds": round(seed_seconds, 2)
+        },
+        "http": asyncio.run(run_http_benchmarks(args, seeded)),
+        "crypto": bench_crypto(args.crypto_iterations),
+        "validation": bench_validation(args.validation_iterations)
+    }
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
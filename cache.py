@@ -0,0 +1,215 @@
+import hashlib, json, logging, os, sqlite3, tempfile, threading, time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from metrics import Gauge, register
+from config import DATABASE_URL, INFO_CACHE_BACKEND, INFO_CACHE_SIZE, INFO_CACHE_TTL, INFO_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    # Read-through cache store for get_info responses, keyed by eid
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+class NullCache(CacheBackend):
+    def get(self, key: str) -> Optional[Any]:
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+class LRUCache(CacheBackend):
+    # In-process LRU with a per-entry TTL; private to one worker
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache(CacheBackend):
+    # File-backed LRU shared by every worker on the same host; values are decrypted responses stored as JSON,
+    # so the file is created readable by its owner only. Eviction runs once every evict_every sets per worker,
+    # so the table can briefly hold up to evict_every entries per worker over max_size; accessed_at is only
+    # rewritten once it is access_resolution seconds old, so most hits are a single SELECT.
+    def __init__(self, path: str, max_size: int, ttl: float, access_resolution: float = 5.0):
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.access_resolution = access_resolution
+        self.evict_every = max(1, max_size // 100)
+        self._sets = 0
+        self._local = threading.local()
+        self._create_file()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS info_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_info_cache_accessed_at ON info_cache (accessed_at)")
+
+    def _create_file(self):
+        # SQLite creates its -wal and -shm files with the database file's permissions
+        descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            if os.fstat(descriptor).st_uid != os.getuid():
+                raise RuntimeError(f"Info cache file {self.path} is owned by another user; set INFO_CACHE_PATH.")
+            os.fchmod(descriptor, 0o600)
+        finally:
+            os.close(descriptor)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute("SELECT value, expires_at, accessed_at FROM info_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            connection.execute("DELETE FROM info_cache WHERE key = ?", (key,))
+            self._count("expirations")
+            self._count("misses")
+            return None
+        if now - accessed_at > self.access_resolution:
+            connection.execute("UPDATE info_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO info_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+        with self._stats_lock:
+            self._sets += 1
+            evict = self._sets % self.evict_every == 0
+        if evict:
+            evicted = connection.execute(
+                "DELETE FROM info_cache WHERE key NOT IN (SELECT key FROM info_cache ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_size,)
+            ).rowcount
+            if evicted > 0:
+                self._count("evictions", evicted)
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM info_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM info_cache")
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM info_cache").fetchone()[0]
+
+def create_cache(backend: str) -> CacheBackend:
+    if backend == "memory":
+        return LRUCache(INFO_CACHE_SIZE, INFO_CACHE_TTL)
+    if backend == "sqlite":
+        # Without INFO_CACHE_PATH, each database gets its own file so two deployments on a host never share entries
+        default_path = os.path.join(
+            tempfile.gettempdir(), f"info_cache-{hashlib.sha256(DATABASE_URL.encode()).hexdigest()[:16]}.sqlite3"
+        )
+        return SQLiteCache(INFO_CACHE_PATH or default_path, INFO_CACHE_SIZE, INFO_CACHE_TTL)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown INFO_CACHE_BACKEND '{backend}'. Expected one of: memory, sqlite, none.")
+
+info_cache = create_cache(INFO_CACHE_BACKEND)
+logger.info("Info cache backend: %s", type(info_cache).__name__)
+register(Gauge("info_cache_events", "Info cache entries and lookup outcomes since start.",
+               lambda: {(name,): value for name, value in info_cache.stats().items()}, ["event"]))
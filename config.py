@@ -7,12 +7,97 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 SQLALCHEMY_POOL_SIZE = int(os.getenv("SQLALCHEMY_POOL_SIZE"))
 SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("SQLALCHEMY_MAX_OVERFLOW"))
+# Optional comma-separated read replica URLs; read-only routes use them round-robin, writes stay on DATABASE_URL
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+# Seconds an unreachable replica is skipped before it is tried again
+REPLICA_RETRY_INTERVAL = float(os.getenv("REPLICA_RETRY_INTERVAL", "30"))
+# Seconds a client's reads stay on the primary after it wrote (0 disables), tracked with a cookie
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+READ_YOUR_WRITES_COOKIE = os.getenv("READ_YOUR_WRITES_COOKIE", "db_primary_until")
+# Test connections on checkout / replace connections older than this many seconds (-1 never)
+SQLALCHEMY_POOL_PRE_PING = os.getenv("SQLALCHEMY_POOL_PRE_PING", "false").lower() == "true"
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "-1"))
+# Total connections all workers may open together (keep it below the database's max_connections, leaving
+# headroom for scripts and admin sessions); each worker's pools get an equal share. Unset: no cap
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET")) if os.getenv("DB_CONNECTION_BUDGET") else None
+# "sync" runs psycopg2 sessions on the threadpool, "async" runs AsyncSession on the event loop
+DB_MODE = os.getenv("DB_MODE", "sync")
+# Async driver URL; derived from DATABASE_URL (asyncpg / aiosqlite) when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# Runs one combined lookup of personal_email/eid/personal_phone before each single insert; by default the
+# unique constraints alone detect conflicts, which saves the round trip on every successful insert
+INSERT_PRECHECK = os.getenv("INSERT_PRECHECK", "false").lower() == "true"
+# Upper bound on records accepted by a single /info_input/bulk request
+BULK_INSERT_MAX_RECORDS = int(os.getenv("BULK_INSERT_MAX_RECORDS", "5000"))
+# Admission control: requests needing a session beyond ADMISSION_LIMIT (default: the pool's size + overflow)
+# wait in a queue, reads ahead of writes; a full queue or a wait over the timeout answers 503 with Retry-After
+ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", "0"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+# "sync" commits /info_input in the request; "queue" answers 202 with a ticket and commits in background batches
+# (single worker only: tickets live in the memory of the worker that issued them)
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+# Submissions buffered before /info_input answers 429, submissions per transaction, and seconds a batch waits to fill
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05"))
+# Seconds a finished ticket's outcome stays available to GET /info_input/{ticket}
+INGEST_TICKET_TTL = float(os.getenv("INGEST_TICKET_TTL", "3600"))
+# Upper bound on eids accepted by a single GET /info_output batch lookup
+INFO_BATCH_MAX_EIDS = int(os.getenv("INFO_BATCH_MAX_EIDS", "500"))
+# Page size bounds for GET /hotels
+HOTELS_PAGE_SIZE = int(os.getenv("HOTELS_PAGE_SIZE", "50"))
+HOTELS_PAGE_MAX = int(os.getenv("HOTELS_PAGE_MAX", "500"))
+# Writes a pre-built, encrypted response document per record and serves /info_output/{eid} from it
+RECORD_DOCUMENTS = os.getenv("RECORD_DOCUMENTS", "false").lower() == "true"
+# Loads get_info records as plain row tuples instead of ORM objects (no identity map or relationship loading)
+INFO_ROW_TUPLES = os.getenv("INFO_ROW_TUPLES", "false").lower() == "true"
+# Directory of archive segments written by archive_records.py; get_info falls back to it when set
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH")
+# Seconds a worker's platform registry is used before it is reloaded, and the minimum seconds between
+# reloads triggered by an unknown platform name
+PLATFORM_REGISTRY_TTL = float(os.getenv("PLATFORM_REGISTRY_TTL", "300"))
+PLATFORM_REFRESH_INTERVAL = float(os.getenv("PLATFORM_REFRESH_INTERVAL", "10"))
+# Skips table creation and seeding at startup; server.py bootstraps once and sets it for its workers
+SKIP_BOOTSTRAP = os.getenv("SKIP_BOOTSTRAP", "false").lower() == "true"
+# Rows fetched per server-side cursor round trip (and records decrypted per batch) by /export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# get_info read-through cache: backend is "memory", "sqlite" (shared by workers on one host) or "none"
+INFO_CACHE_BACKEND = os.getenv("INFO_CACHE_BACKEND", "memory")
+INFO_CACHE_SIZE = int(os.getenv("INFO_CACHE_SIZE", "10000"))
+INFO_CACHE_TTL = float(os.getenv("INFO_CACHE_TTL", "60"))
+INFO_CACHE_PATH = os.getenv("INFO_CACHE_PATH")
+
+# Adds a Server-Timing header (db, pool, crypto, validation, total) to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+# Directory where workers share their metrics so any worker's /metrics covers all of them (server.py sets one
+# when running several workers), and seconds between a worker's writes
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "5"))
 
 # AES key 
 AES_KEY = os.getenv("AES_KEY")
+# Keyring for rotation as "id:hexkey,id:hexkey" (AES_KEY, when set, is id 0 and may be left out once retired);
+# new values use AES_ACTIVE_KEY_ID, the highest id by default
+AES_KEYS = os.getenv("AES_KEYS")
+AES_ACTIVE_KEY_ID = int(os.getenv("AES_ACTIVE_KEY_ID")) if os.getenv("AES_ACTIVE_KEY_ID") else None
+# HMAC key for blind indexes on encrypted columns (derived from AES_KEY when unset; required with AES_KEYS)
+BLIND_INDEX_KEY = os.getenv("BLIND_INDEX_KEY")
 # Logging level 
 LOG_LEVEL = os.getenv("LOG_LEVEL")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(levelname)s:%(name)s:%(message)s")
+# Records buffered for the background log writer; further records are dropped rather than blocking requests
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Per-row debug messages (logged with a sample_key) are sampled and then rate limited per key per second
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "10"))
 
 # Host and port
 HOST = os.getenv("HOST")
 PORT = int(os.getenv("PORT"))
+# Worker processes started by server.py
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+# Seconds server.py lets in-flight requests finish after SIGTERM before closing them
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
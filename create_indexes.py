@@ -0,0 +1,39 @@
+import argparse, logging
+from sqlalchemy import inspect
+from database import Base, engine
+from logging_setup import setup_logging
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+# create_tables only creates missing tables, so indexes added to existing tables in models.py are created here.
+# On PostgreSQL they are built CONCURRENTLY, which does not block writes but cannot run in a transaction.
+def missing_indexes() -> list:
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in sorted(table.indexes, key=lambda index: index.name) if index.name not in existing)
+    return missing
+
+def create_indexes(dry_run: bool = False) -> int:
+    indexes = missing_indexes()
+    concurrently = engine.dialect.name == "postgresql"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for index in indexes:
+            logger.info("Creating index %s on %s...", index.name, index.table.name)
+            if not dry_run:
+                index.dialect_options["postgresql"]["concurrently"] = concurrently
+                index.create(connection)
+    return len(indexes)
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Create indexes declared in models.py that the database is missing.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the missing indexes")
+    args = parser.parse_args()
+    count = create_indexes(args.dry_run)
+    logger.info("%d indexes %s", count, "missing" if args.dry_run else "created")
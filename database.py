@@ -1,47 +1,305 @@
-import traceback, logging
-from sqlalchemy import create_engine, inspect
+import hashlib, itertools, logging, math, time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, delete, func, insert, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
-from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL, SQLALCHEMY_POOL_SIZE, SQLALCHEMY_MAX_OVERFLOW, LOG_LEVEL
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from metrics import Gauge, instrument_engine, record_pool_wait, register
+from typing import Callable, Dict, Optional, Tuple
+from config import DATABASE_URL, ASYNC_DATABASE_URL, DB_MODE, SQLALCHEMY_POOL_SIZE, SQLALCHEMY_MAX_OVERFLOW
+from config import SQLALCHEMY_POOL_PRE_PING, SQLALCHEMY_POOL_RECYCLE, DB_CONNECTION_BUDGET, WEB_CONCURRENCY
+from config import DATABASE_READ_URLS, REPLICA_RETRY_INTERVAL, READ_YOUR_WRITES_WINDOW, READ_YOUR_WRITES_COOKIE
 
-# Set up logging
-logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Async mode runs a second (async) engine in every worker
+ENGINES_PER_WORKER = 2 if DB_MODE == "async" else 1
+
+def pool_limits(workers: int = WEB_CONCURRENCY) -> Tuple[int, int]:
+    # (pool_size, max_overflow) of each engine; with a budget, workers x engines x (pool + overflow) <= budget
+    if DB_CONNECTION_BUDGET is None:
+        return SQLALCHEMY_POOL_SIZE, SQLALCHEMY_MAX_OVERFLOW
+    per_engine = DB_CONNECTION_BUDGET // (workers * ENGINES_PER_WORKER)
+    if per_engine < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET} cannot give {workers} workers x {ENGINES_PER_WORKER} engines a connection each."
+        )
+    pool_size = min(SQLALCHEMY_POOL_SIZE, per_engine)
+    return pool_size, per_engine - pool_size
+
+POOL_SIZE, MAX_OVERFLOW = pool_limits()
+POOL_OPTIONS = {"pool_pre_ping": SQLALCHEMY_POOL_PRE_PING, "pool_recycle": SQLALCHEMY_POOL_RECYCLE}
+
 # engine to create DB & Base for ORM models
-engine = create_engine(DATABASE_URL, pool_size=SQLALCHEMY_POOL_SIZE, max_overflow=SQLALCHEMY_MAX_OVERFLOW)
-Base: DeclarativeMeta = declarative_base()
+engine = create_engine(DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, **POOL_OPTIONS)
+instrument_engine(engine)
+# Unique constraints get PostgreSQL's own default names on every backend, so services can map a
+# violated constraint back to its column no matter which database created the schema
+Base: DeclarativeMeta = declarative_base(metadata=MetaData(naming_convention={"ix": "ix_%(column_0_label)s", "uq": "%(table_name)s_%(column_0_name)s_key"}))
 
 # Function to create all tables if not exist
 def create_tables():
     try:
         logger.info("Checking if tables exist...")
         inspector = inspect(engine)
-        existing_tables = inspector.get_table_names()
-        if not existing_tables:
-            logger.info("No tables found. Creating tables...")
-            Base.metadata.create_all(bind=engine)
+        existing_tables = set(inspector.get_table_names())
+        missing_tables = [table for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+        if missing_tables:
+            logger.info("Creating tables: %s", ", ".join(table.name for table in missing_tables))
+            Base.metadata.create_all(bind=engine, tables=missing_tables)
             logger.info("Tables created successfully!")
         else:
             logger.info("Tables already exist!")
         
     except Exception as e:
-        logger.exception(f"Error in creating tables: {e}")
+        logger.exception("Error in creating tables: %s", e)
         raise
 
+# Single row holding the fingerprint of the schema the database was last bootstrapped for,
+# so a worker that finds it current skips reflection and seeding with one primary key lookup
+schema_version = Table(
+    "schema_version", Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+def schema_fingerprint() -> str:
+    # Hash of every declared table, column and index; models must be imported first
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name):
+        parts.append(table.name)
+        parts.extend(f"{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}:{column.unique}" for column in table.columns)
+        parts.extend(sorted(f"{index.name}:{[column.name for column in index.columns]}:{index.unique}" for index in table.indexes))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def stored_fingerprint() -> Optional[str]:
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(schema_version.c.fingerprint).where(schema_version.c.id == 1)).scalar()
+    except (OperationalError, ProgrammingError):
+        # Databases bootstrapped before schema_version existed
+        return None
+
+def record_fingerprint(fingerprint: str):
+    with engine.begin() as connection:
+        connection.execute(delete(schema_version).where(schema_version.c.id == 1))
+        connection.execute(insert(schema_version).values(id=1, fingerprint=fingerprint))
+
+def bootstrap(seed: Callable[[], None]) -> bool:
+    # Creates missing tables and runs seed, unless the database already matches this code's schema.
+    # Changes to existing tables (columns, indexes) still go through the migration scripts.
+    fingerprint = schema_fingerprint()
+    if stored_fingerprint() == fingerprint:
+        logger.info("Schema fingerprint %s is current, skipping bootstrap", fingerprint[:12])
+        return False
+    create_tables()
+    seed()
+    record_fingerprint(fingerprint)
+    logger.info("Bootstrapped schema fingerprint %s", fingerprint[:12])
+    return True
+
 # SessionLocal creates session instances
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Dependency to get the database session
-def get_db():
+# Maps a sync DATABASE_URL onto the matching asyncio driver
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def to_async_url(url: str) -> str:
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}'. Set ASYNC_DATABASE_URL explicitly.")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def create_async(url: str):
+    return create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **POOL_OPTIONS
+    )
+
+# The async engine only exists in async mode; the sync engine is still used for bootstrap and scripts
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    async_engine = create_async(ASYNC_DATABASE_URL or to_async_url(DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    instrument_engine(async_engine.sync_engine)
+elif DB_MODE != "sync":
+    raise ValueError(f"Invalid DB_MODE '{DB_MODE}'. Expected 'sync' or 'async'.")
+
+class ReplicaSet:
+    # Round-robin over read replicas; a replica whose connection fails sits out REPLICA_RETRY_INTERVAL seconds
+    def __init__(self, engines: list, retry_interval: float):
+        self.engines = engines
+        self.retry_interval = retry_interval
+        self._turn = itertools.count()
+        self._down_until: Dict[int, float] = {}
+
+    def candidates(self) -> list:
+        if not self.engines:
+            return []
+        start = next(self._turn) % len(self.engines)
+        now = time.monotonic()
+        ordered = self.engines[start:] + self.engines[:start]
+        return [engine for engine in ordered if self._down_until.get(id(engine), 0) <= now]
+
+    def mark_down(self, engine, error: Exception):
+        self._down_until[id(engine)] = time.monotonic() + self.retry_interval
+        logger.warning("Read replica %s unavailable, retrying in %.0fs: %s", engine.url.host or engine.url.database,
+                       self.retry_interval, error)
+
+    def healthy(self) -> int:
+        now = time.monotonic()
+        return sum(1 for engine in self.engines if self._down_until.get(id(engine), 0) <= now)
+
+# Read replicas: same pool sizing per engine as the primary, since each replica is its own database server
+read_engines = [create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, **POOL_OPTIONS) for url in DATABASE_READ_URLS]
+for read_engine in read_engines:
+    instrument_engine(read_engine)
+replicas = ReplicaSet(read_engines, REPLICA_RETRY_INTERVAL)
+async_replicas = ReplicaSet([create_async(to_async_url(url)) for url in DATABASE_READ_URLS] if DB_MODE == "async" else [], REPLICA_RETRY_INTERVAL)
+
+def open_session() -> Session:
     db = SessionLocal()
+    db.connection()
+    return db
+
+def open_read_session() -> Session:
+    # Falls back to the primary when no replica is configured or reachable
+    for read_engine in replicas.candidates():
+        db = SessionLocal(bind=read_engine)
+        try:
+            db.connection()
+            return db
+        except OperationalError as e:
+            db.close()
+            replicas.mark_down(read_engine, e)
+    return open_session()
+
+def session_scope(open_db: Callable[[], Session]):
+    started = time.perf_counter()
+    db = open_db()
     try:
+        # The connection is checked out up front so pool wait time is measured on its own
+        record_pool_wait(time.perf_counter() - started)
         yield db
         db.commit()
+    except HTTPException:
+        # Client errors (404, 400, ...) are expected outcomes, not failures worth a traceback
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
-        logger.exception(f"traceback: {traceback.format_exc()}")
+        logger.exception("Database session rolled back: %s", e)
         raise 
     finally:
         db.close()
-        logger.info("Database session closed.") 
+        logger.debug("Database session closed.", extra={"sample_key": "db_session_closed"})
+
+# Dependency to get the database session
+def get_db():
+    yield from session_scope(open_session)
+
+# Read-only counterpart; pinned sessions stay on the primary (see ReadYourWritesMiddleware)
+def get_read_db(pinned: bool = False):
+    yield from session_scope(open_session if pinned else open_read_session)
+
+async def open_async_session(use_replica: bool) -> AsyncSession:
+    for read_engine in async_replicas.candidates() if use_replica else []:
+        db = AsyncSession(read_engine, autoflush=False, expire_on_commit=False)
+        try:
+            await db.connection()
+            return db
+        except OperationalError as e:
+            await db.close()
+            async_replicas.mark_down(read_engine, e)
+    db = AsyncSessionLocal()
+    await db.connection()
+    return db
+
+@asynccontextmanager
+async def async_session_scope(use_replica: bool):
+    started = time.perf_counter()
+    db = await open_async_session(use_replica)
+    try:
+        record_pool_wait(time.perf_counter() - started)
+        yield db
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Database session rolled back: %s", e)
+        raise
+    finally:
+        await db.close()
+        logger.debug("Database session closed.", extra={"sample_key": "db_session_closed"})
+
+# Async counterparts of get_db / get_read_db
+async def get_async_db():
+    async with async_session_scope(use_replica=False) as db:
+        yield db
+
+async def get_async_read_db(pinned: bool = False):
+    async with async_session_scope(use_replica=not pinned) as db:
+        yield db
+
+# Read-your-writes: a successful write sets a short-lived cookie, and reads carrying it skip the replicas
+# so the client sees its own write despite replication lag
+def mark_write(request: Request):
+    request.state.db_wrote = True
+
+def pinned_to_primary(request: Request) -> bool:
+    if not read_engines or READ_YOUR_WRITES_WINDOW <= 0:
+        return False
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app, window: float = READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not read_engines or self.window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and scope.get("state", {}).get("db_wrote"):
+                cookie = f"{READ_YOUR_WRITES_COOKIE}={time.time() + self.window:.3f}; Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def pool_status() -> dict:
+    pools = {"primary": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.pool
+    for position, read_engine in enumerate(read_engines):
+        pools[f"replica{position}"] = read_engine.pool
+    for position, read_engine in enumerate(async_replicas.engines):
+        pools[f"async_replica{position}"] = read_engine.pool
+    status = {}
+    for name, pool in pools.items():
+        if hasattr(pool, "checkedout"):
+            status[(name, "checked_out")] = pool.checkedout()
+            status[(name, "idle")] = pool.checkedin()
+            status[(name, "overflow")] = max(pool.overflow(), 0)
+    return status
+
+register(Gauge("db_pool_connections", "Connections per pool and state.", pool_status, ["pool", "state"]))
+register(Gauge("db_replicas", "Configured and currently healthy read replicas.",
+               lambda: {("configured",): len(read_engines), ("healthy",): replicas.healthy()}, ["state"]))
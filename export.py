@@ -0,0 +1,103 @@
+import csv, io, json, logging
+from typing import Iterator, List, Optional
+from database import open_read_session
+from models import HotelInfo, SocialMediaInfo
+from statements import record_rows
+from AES import decrypt_many
+from services import build_personal_info, build_hotel_info, build_agency_info, build_social_media_info_list
+from config import EXPORT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CSV_COLUMNS = [
+    "first_name", "last_name", "title", "personal_email", "eid", "country_code", "personal_phone",
+    "hotel_name", "marsha_code", "managed_franchise", "country", "state", "city", "zip_code",
+    "agency_name", "primary_contact", "primary_email", "primary_phone", "not_applicable",
+    "platform", "sma_name", "sma_person", "sma_email", "sma_phone", "pageURL", "pageID", "mi_fbm", "added_dcube"
+]
+
+# statements.record_rows with the inner hotel join of an export: hotel-less personal rows are skipped
+def export_statement(country: Optional[str] = None, state: Optional[str] = None, marsha_code: Optional[str] = None):
+    statement = record_rows.where(HotelInfo.hid.is_not(None)).order_by(HotelInfo.hid, SocialMediaInfo.sid)
+    if country is not None:
+        statement = statement.where(HotelInfo.country == country)
+    if state is not None:
+        statement = statement.where(HotelInfo.state == state)
+    if marsha_code is not None:
+        statement = statement.where(HotelInfo.marsha_code == marsha_code)
+    return statement
+
+def iter_record_groups(rows: Iterator, chunk_size: int) -> Iterator[List[list]]:
+    # Rows arrive ordered by hid; consecutive rows with the same hid form one record graph
+    chunk, group = [], []
+    for row in rows:
+        if group and row.hid != group[0].hid:
+            chunk.append(group)
+            group = []
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        group.append(row)
+    if group:
+        chunk.append(group)
+    if chunk:
+        yield chunk
+
+def build_records(chunk: List[list]) -> List[dict]:
+    # All ciphertext of a chunk is decrypted in one batch
+    social_rows = [row for group in chunk for row in group if row.sid is not None]
+    plaintexts = iter(decrypt_many([token for row in social_rows for token in (row.pageURL, row.pageID)]))
+    records = []
+    for group in chunk:
+        first = group[0]
+        group_social_rows = [row for row in group if row.sid is not None]
+        decrypted_info = {row.plid: {"pageURL": next(plaintexts), "pageID": next(plaintexts)} for row in group_social_rows}
+        records.append({
+            "Personal Info": build_personal_info(first),
+            "Hotel Info": build_hotel_info(first),
+            "Agency Info": build_agency_info(first if first.aid is not None else None),
+            "Social Media Info": build_social_media_info_list(group_social_rows, decrypted_info),
+        })
+    return records
+
+def to_ndjson(records: List[dict]) -> str:
+    return "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+
+def to_csv(records: List[dict], header: bool) -> str:
+    # One line per social media entry; records without one still get a line
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    for record in records:
+        base = {**record["Personal Info"], **record["Hotel Info"], **record["Agency Info"]}
+        platforms = record["Social Media Info"].items() or [(None, {})]
+        for platform_name, social_media in platforms:
+            line = {**base, **social_media, "platform": platform_name}
+            writer.writerow([line.get(name) for name in CSV_COLUMNS])
+    return buffer.getvalue()
+
+def stream_export(format: str = "ndjson", country: Optional[str] = None, state: Optional[str] = None,
+                  marsha_code: Optional[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    # Owns its (replica) session because the response body outlives the request's get_db dependency
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{format}'.")
+    db = open_read_session()
+    exported = 0
+    try:
+        # yield_per streams through a server-side cursor, keeping memory flat regardless of table size
+        result = db.execute(export_statement(country, state, marsha_code).execution_options(yield_per=chunk_size))
+        if format == "csv":
+            yield to_csv([], header=True)
+        for chunk in iter_record_groups(result, chunk_size):
+            records = build_records(chunk)
+            exported += len(records)
+            yield to_ndjson(records) if format == "ndjson" else to_csv(records, header=False)
+        logger.info("Export completed: %d records", exported)
+    except Exception as e:
+        logger.exception("Export failed after %d records: %s", exported, e)
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,153 @@
+import logging, math, queue, threading, time, uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from database import SessionLocal
+from schema import Create
+from services import post_info_bulk
+from metrics import Gauge, register
+from config import INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_TICKET_TTL
+
+logger = logging.getLogger(__name__)
+
+def unique_values(input: Create) -> set:
+    # Every value a unique constraint covers, tagged by column
+    values = {("personal_email", input.personal_email), ("eid", input.eid), ("personal_phone", input.personal_phone)}
+    for social_media_model in input.platform_inputs.values():
+        values.add(("pageURL", social_media_model.pageURL))
+        values.add(("pageID", social_media_model.pageID))
+    return values
+
+class IngestQueue:
+    # Write-behind buffer for /info_input: requests only enqueue a validated payload and get a ticket,
+    # a background thread commits many submissions per transaction through post_info_bulk.
+    # Tickets live in this worker's memory, so status lookups must reach the worker that issued them;
+    # server.py refuses to start several workers in this mode.
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, ticket_ttl: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ticket_ttl = ticket_ttl
+        self._queue: "queue.Queue[Tuple[str, Create]]" = queue.Queue(max_size)
+        self._tickets: Dict[str, dict] = {}
+        # (completed_at, ticket id) in completion order, so expired outcomes are pruned from the left
+        self._completed: Deque[Tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rejected = 0
+        self.batches = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-batcher", daemon=True)
+        self._thread.start()
+        logger.info("Ingest batcher started (batch size %d, flush interval %.3fs)", self.batch_size, self.flush_interval)
+
+    def stop(self, timeout: float = 30.0):
+        # Drains what is already queued before returning
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Ingest batcher did not drain within %.0fs; %d submissions left queued", timeout, self._queue.qsize())
+        self._thread = None
+
+    def submit(self, input: Create) -> dict:
+        if self._stopping.is_set():
+            raise HTTPException(status_code=503, detail="Ingestion is shutting down.")
+        ticket_id = uuid.uuid4().hex
+        ticket = {"ticket": ticket_id, "eid": input.eid, "status": "queued", "submitted_at": time.time()}
+        with self._lock:
+            self._tickets[ticket_id] = ticket
+        try:
+            self._queue.put_nowait((ticket_id, input))
+        except queue.Full:
+            with self._lock:
+                del self._tickets[ticket_id]
+                self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Ingestion queue is full, retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(self.flush_interval)))}
+            )
+        return dict(ticket)
+
+    def status(self, ticket_id: str) -> Optional[dict]:
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            return dict(ticket) if ticket is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._tickets) - len(self._completed)
+            return {"depth": self._queue.qsize(), "pending": pending, "completed": len(self._completed),
+                    "rejected": self.rejected, "batches": self.batches}
+
+    def _next_batch(self) -> List[Tuple[str, Create]]:
+        # Blocks for the first submission, then collects more until the batch is full or the flush interval passes
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, Create]]):
+        # One transaction per round; post_info_bulk isolates conflicting submissions so the rest still commit.
+        # A submission rejected while sharing a unique value with an earlier one of the same round goes into
+        # the next round, so it gets the answer it would have had on its own: "already exists" once the
+        # earlier one is committed, or a normal insert if that one failed.
+        outcomes: List[Optional[dict]] = [None] * len(batch)
+        pending = list(range(len(batch)))
+        try:
+            while pending:
+                with SessionLocal() as db:
+                    results = post_info_bulk([batch[index][1] for index in pending], db)["results"]
+                    db.commit()
+                retry, seen = [], set()
+                for index, outcome in zip(pending, results):
+                    values = unique_values(batch[index][1])
+                    if outcome["status"] == "error" and values & seen:
+                        retry.append(index)
+                    else:
+                        outcomes[index] = outcome
+                    seen |= values
+                pending = retry
+        except Exception as e:
+            logger.exception("Ingest batch of %d submissions failed: %s", len(batch), e)
+            for index in pending:
+                outcomes[index] = {"status": "error", "status_code": 500, "detail": "Internal server error."}
+
+        now = time.time()
+        with self._lock:
+            self.batches += 1
+            for (ticket_id, _), outcome in zip(batch, outcomes):
+                ticket = self._tickets.get(ticket_id)
+                if ticket is None:
+                    continue
+                ticket.update({key: value for key, value in outcome.items() if key not in ("index", "eid")})
+                ticket["completed_at"] = now
+                self._completed.append((now, ticket_id))
+            cutoff = now - self.ticket_ttl
+            while self._completed and self._completed[0][0] < cutoff:
+                self._tickets.pop(self._completed.popleft()[1], None)
+        logger.debug("Ingest batch of %d submissions committed", len(batch), extra={"sample_key": "ingest_batch"})
+
+ingest_queue = IngestQueue(INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_TICKET_TTL)
+register(Gauge("ingest_queue", "Write-behind ingestion queue depth and ticket outcomes.",
+               lambda: {(name,): value for name, value in ingest_queue.stats().items()}, ["state"]))
@@ -0,0 +1,75 @@
+import atexit, logging, queue, random, threading, time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from metrics import Gauge, register
+from config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE, LOG_RATE_LIMIT
+
+# One process-wide logging pipeline: request threads only enqueue records, a background
+# QueueListener thread formats and writes them. Modules just call logging.getLogger(__name__).
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Drops records instead of blocking the request when the writer falls behind
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so the record is passed as-is and the
+        # message is formatted on the listener thread rather than here
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class SamplingFilter(logging.Filter):
+    # Records logged with extra={"sample_key": ...} are sampled at LOG_SAMPLE_RATE and capped at
+    # LOG_RATE_LIMIT records per second per key; everything else passes untouched
+    def __init__(self, sample_rate: float = LOG_SAMPLE_RATE, rate_limit: float = LOG_RATE_LIMIT):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        now = int(time.monotonic())
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0])
+            if window[0] != now:
+                window[0], window[1] = now, 0
+            window[1] += 1
+            return window[1] <= self.rate_limit
+
+def setup_logging(level: Optional[str] = LOG_LEVEL) -> QueueListener:
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(level or logging.INFO)
+
+        register(Gauge("log_records", "Records waiting in or dropped from the log queue.",
+                       lambda: {("queued",): log_queue.qsize(), ("dropped",): queue_handler.dropped}, ["state"]))
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # Flushes whatever is still queued when the process exits
+        atexit.register(_listener.stop)
+        return _listener
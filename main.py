@@ -1,27 +1,74 @@
+import time
+# Import time of this module and everything it pulls in (FastAPI, SQLAlchemy mappers, pydantic schemas, AES),
+# reported as the "import" startup phase
+import_started = time.perf_counter()
 import logging, uvicorn
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Body, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from database import get_db, create_tables
-from services import post_info, get_info 
+from fastapi.responses import JSONResponse, PlainTextResponse, Response as RawResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, configure_mappers
+from typing import Any, Dict, List, Optional
+from database import bootstrap, engine, async_engine, read_engines, async_replicas, ReadYourWritesMiddleware
+from admission import get_db_for_read, get_db_for_write, get_async_db_for_read, get_async_db_for_write, admit_export, admitted_stream
+from services import post_info, post_info_bulk, get_info_cached, get_info_many, post_info_async, post_info_bulk_async, get_info_cached_async, get_info_many_async, list_hotels, list_hotels_async, get_info_document, get_info_document_async
+from export import stream_export, EXPORT_FORMATS
+from ingest import ingest_queue
+from archive import record_archive
 from schema import Create, Response
-from platform_table import populate_platform_info
-from config import HOST, PORT, LOG_LEVEL
+from logging_setup import setup_logging
+from metrics import MetricsMiddleware, metrics_exporter, render_metrics, record_startup_phase, startup_phase, startup_phases
+from platform_table import populate_platform_info, load_platform_registry, refresh_platform_registry
+from config import HOST, PORT, BULK_INSERT_MAX_RECORDS, INFO_BATCH_MAX_EIDS, RECORD_DOCUMENTS, SKIP_BOOTSTRAP, DB_MODE, INGEST_MODE, HOTELS_PAGE_SIZE, HOTELS_PAGE_MAX
 from contextlib import asynccontextmanager
 
-logging.basicConfig(level=LOG_LEVEL)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_tables()  # Creates tables if they don't exist
-    populate_platform_info()  # Populate PlatformInfo table with predefined values
-    logger.info("Startup event completed successfully")
+    started = time.perf_counter()
+    with startup_phase("bootstrap"):
+        if SKIP_BOOTSTRAP:
+            logger.info("SKIP_BOOTSTRAP is set, assuming tables and platforms exist")
+        else:
+            # Creates missing tables and populates PlatformInfo, unless the stored schema fingerprint is current
+            bootstrap(populate_platform_info)
+    with startup_phase("platform_registry"):
+        load_platform_registry()  # Cache platform name <-> plid for the lifetime of this worker
+    if record_archive is not None:
+        with startup_phase("archive_index"):
+            record_archive.refresh()
+    with startup_phase("mappers"):
+        # Paid here rather than by the first request
+        configure_mappers()
+    if INGEST_MODE == "queue":
+        ingest_queue.start()
+    metrics_exporter.start()
+    record_startup_phase("lifespan", time.perf_counter() - started)
+    logger.info("Startup event completed successfully in %.3fs after %.3fs of imports (DB_MODE=%s, INGEST_MODE=%s)",
+                startup_phases["lifespan"], startup_phases.get("import", 0.0), DB_MODE, INGEST_MODE)
     yield
+    # Runs after the server stopped accepting and in-flight requests finished (or GRACEFUL_TIMEOUT passed)
+    ingest_queue.stop()
+    metrics_exporter.stop()
+    if record_archive is not None:
+        record_archive.close()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for read_engine in async_replicas.engines:
+        await read_engine.dispose()
+    for read_engine in read_engines:
+        read_engine.dispose()
+    engine.dispose()
+    logger.info("Shutdown completed, connection pools closed")
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins = ["http://localhost:3000"], 
@@ -34,14 +81,136 @@ app.add_middleware(
 def root():
     return {'message': 'Connection established successfully'}
 
-@app.post("/info_input", response_model=Response, status_code=201)
-def info_input(input_data: Create, db: Session = Depends(get_db)):
-    post_info(input_data, db)
-    return JSONResponse(content={"message": "Record inserted successfully!"}, status_code=201)
+def check_bulk_size(input_data: List[Dict[str, Any]]):
+    # Records are validated one by one so a bad record is reported instead of failing the whole batch
+    if not input_data:
+        raise HTTPException(status_code=422, detail="At least one record is required.")
+    if len(input_data) > BULK_INSERT_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"A bulk request accepts at most {BULK_INSERT_MAX_RECORDS} records.")
+
+def parse_eids(eids: List[str]) -> List[str]:
+    # Accepts repeated ?eids=a&eids=b as well as ?eids=a,b
+    parsed = [eid.strip() for value in eids for eid in value.split(",") if eid.strip()]
+    if not parsed:
+        raise HTTPException(status_code=422, detail="At least one eid is required.")
+    if len(parsed) > INFO_BATCH_MAX_EIDS:
+        raise HTTPException(status_code=413, detail=f"A batch lookup accepts at most {INFO_BATCH_MAX_EIDS} eids.")
+    return parsed
+
+def hotel_filters(
+    cursor: Optional[int] = Query(None, ge=0, description="next_cursor of the previous page"),
+    limit: int = Query(HOTELS_PAGE_SIZE, ge=1, le=HOTELS_PAGE_MAX),
+    marsha_code: Optional[str] = None,
+    country: Optional[str] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    managed_franchise: Optional[str] = None,
+    platform: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "cursor": cursor, "limit": limit, "marsha_code": marsha_code, "country": country, "state": state,
+        "city": city, "managed_franchise": managed_franchise, "platform": platform
+    }
+
+# INGEST_MODE=queue: /info_input only validates and enqueues; the outcome is read back by ticket
+if INGEST_MODE == "queue":
+    @app.post("/info_input", status_code=202)
+    def info_input_queued(input_data: Create):
+        ticket = ingest_queue.submit(input_data)
+        return JSONResponse(content=ticket, status_code=202, headers={"Location": f"/info_input/{ticket['ticket']}"})
+
+    @app.get("/info_input/{ticket}", status_code=200)
+    def info_input_status(ticket: str):
+        status = ingest_queue.status(ticket)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Ticket not found or expired.")
+        return status
+
+# DB_MODE picks which flavour of the database routes is registered
+if DB_MODE == "async":
+    if INGEST_MODE != "queue":
+        @app.post("/info_input", response_model=Response, status_code=201)
+        async def info_input(input_data: Create, db: AsyncSession = Depends(get_async_db_for_write)):
+            await post_info_async(input_data, db)
+            return JSONResponse(content={"message": "Record inserted successfully!"}, status_code=201)
+
+    @app.post("/info_input/bulk", status_code=200)
+    async def info_input_bulk(input_data: List[Dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_async_db_for_write)):
+        check_bulk_size(input_data)
+        return await post_info_bulk_async(input_data, db)
+
+    @app.get("/info_output", status_code=200)
+    async def info_output_batch(eids: List[str] = Query(...), db: AsyncSession = Depends(get_async_db_for_read)):
+        return await get_info_many_async(parse_eids(eids), db)
+
+    @app.get("/info_output/{eid}", status_code=200)
+    async def info_output(eid: str, db: AsyncSession = Depends(get_async_db_for_read)):
+        if RECORD_DOCUMENTS:
+            document = await get_info_document_async(eid, db)
+            if document is not None:
+                return RawResponse(content=document, media_type="application/json")
+        return await get_info_cached_async(eid, db)
+
+    @app.get("/hotels", status_code=200)
+    async def hotels(filters: Dict[str, Any] = Depends(hotel_filters), db: AsyncSession = Depends(get_async_db_for_read)):
+        return await list_hotels_async(db, **filters)
+else:
+    if INGEST_MODE != "queue":
+        @app.post("/info_input", response_model=Response, status_code=201)
+        def info_input(input_data: Create, db: Session = Depends(get_db_for_write)):
+            post_info(input_data, db)
+            return JSONResponse(content={"message": "Record inserted successfully!"}, status_code=201)
+
+    @app.post("/info_input/bulk", status_code=200)
+    def info_input_bulk(input_data: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db_for_write)):
+        check_bulk_size(input_data)
+        return post_info_bulk(input_data, db)
+
+    @app.get("/info_output", status_code=200)
+    def info_output_batch(eids: List[str] = Query(...), db: Session = Depends(get_db_for_read)):
+        return get_info_many(parse_eids(eids), db)
+
+    @app.get("/info_output/{eid}", status_code=200)
+    def info_output(eid: str, db: Session = Depends(get_db_for_read)):
+        # Records written before RECORD_DOCUMENTS was enabled have no document and use the regular path
+        if RECORD_DOCUMENTS:
+            document = get_info_document(eid, db)
+            if document is not None:
+                return RawResponse(content=document, media_type="application/json")
+        return get_info_cached(eid, db)
+
+    @app.get("/hotels", status_code=200)
+    def hotels(filters: Dict[str, Any] = Depends(hotel_filters), db: Session = Depends(get_db_for_read)):
+        return list_hotels(db, **filters)
+
+# The stream holds a low-priority admission slot for its whole length, since its session outlives the request
+@app.get("/export", status_code=200)
+async def export(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    country: Optional[str] = None,
+    state: Optional[str] = None,
+    marsha_code: Optional[str] = None
+):
+    slot = await admit_export()
+    return StreamingResponse(
+        admitted_stream(stream_export(format, country, state, marsha_code), slot),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=export.{format}"},
+        background=BackgroundTask(slot.release)
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Reloads the registry of the worker that handles the request; the others pick the change up on their
+# next unknown platform name or after PLATFORM_REGISTRY_TTL
+@app.post("/platforms/refresh", status_code=200)
+def platforms_refresh():
+    registry = refresh_platform_registry()
+    return {"platforms": dict(registry.by_name)}
 
-@app.get("/info_output/{eid}", status_code=200)
-def info_output(eid: str, db: Session = Depends(get_db)):
-    return get_info(eid, db)
+record_startup_phase("import", time.perf_counter() - import_started)
 
 if __name__ == "__main__":
     logger.info("Starting the API server...")
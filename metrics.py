@@ -0,0 +1,303 @@
+import json, logging, os, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import METRICS_SERVER_TIMING, METRICS_DIR, METRICS_EXPORT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Minimal Prometheus text-format registry. Values are per process and every series carries a worker="<pid>"
+# label. With METRICS_DIR set, each worker also writes its series there every METRICS_EXPORT_INTERVAL seconds,
+# and /metrics on any worker returns its own series plus the latest ones of every other live worker.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    # The pid is read per call: workers are forked after this module is imported
+    pairs = [f'worker="{os.getpid()}"'] + [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *label_values: str):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{format_labels(self.label_names, key)} {value}" for key, value in values]
+
+class Gauge(Metric):
+    # Read at scrape time from a callback returning {label values: value}
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]], labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("Gauge %s callback failed: %s", self.name, e)
+            return []
+        return self.header() + [f"{self.name}{format_labels(self.label_names, key)} {value}" for key, value in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        lines = self.header()
+        for key, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            bucket_labels = format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+REGISTRY: List[Metric] = []
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+def collect_samples() -> Dict[str, List[str]]:
+    # Metric name -> sample lines of this worker
+    return {metric.name: metric.render()[2:] for metric in REGISTRY}
+
+def worker_file(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker-{pid}.json")
+
+def export_samples():
+    path = worker_file(os.getpid())
+    with open(path + ".tmp", "w") as export_file:
+        json.dump(collect_samples(), export_file)
+    os.replace(path + ".tmp", path)
+
+def other_worker_samples() -> List[Dict[str, List[str]]]:
+    own_name = os.path.basename(worker_file(os.getpid()))
+    samples = []
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith("worker-") and name.endswith(".json")) or name == own_name:
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            # A worker that exited leaves its file behind; drop it with its series
+            os.kill(int(name[7:-5]), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        except (ValueError, PermissionError):
+            continue
+        try:
+            with open(path) as export_file:
+                samples.append(json.load(export_file))
+        except (FileNotFoundError, ValueError):
+            continue
+    return samples
+
+def render_metrics() -> str:
+    lines = []
+    others = other_worker_samples() if METRICS_DIR else []
+    for metric in REGISTRY:
+        rendered = metric.render()
+        if not rendered:
+            rendered = metric.header()
+        lines.extend(rendered)
+        for samples in others:
+            lines.extend(samples.get(metric.name, []))
+    return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    # Background thread writing this worker's series to METRICS_DIR
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if METRICS_DIR is None or self._thread is not None:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                export_samples()
+            except OSError as e:
+                logger.warning("Could not export metrics to %s: %s", METRICS_DIR, e)
+            if self._stop.wait(self.interval):
+                break
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            os.remove(worker_file(os.getpid()))
+        except FileNotFoundError:
+            pass
+
+metrics_exporter = MetricsExporter(METRICS_EXPORT_INTERVAL)
+
+http_requests_total = register(Counter("http_requests_total", "HTTP requests handled.", ["method", "route", "status"]))
+http_request_duration = register(Histogram("http_request_duration_seconds", "HTTP request latency.", ["method", "route"]))
+db_statements_total = register(Counter("db_statements_total", "SQL statements executed."))
+db_statement_duration = register(Histogram("db_statement_duration_seconds", "SQL statement execution time."))
+db_pool_checkout_wait = register(Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection."))
+phase_duration = register(Histogram("phase_duration_seconds", "Time spent in crypto and validation phases.", ["phase"]))
+
+# Per-request phase totals, read by the middleware for the Server-Timing header.
+# Threadpool workers inherit a copy of the context, so they update the same dict.
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def record_phase(phase: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        phase_duration.observe(elapsed, phase)
+        record_phase(phase, elapsed)
+
+# Per-worker startup phase durations, kept for the life of the process
+startup_phases: Dict[str, float] = {}
+
+def record_startup_phase(phase: str, seconds: float):
+    startup_phases[phase] = seconds
+    logger.info("Startup phase %s took %.3fs", phase, seconds)
+
+@contextmanager
+def startup_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(phase, time.perf_counter() - started)
+
+register(Gauge("startup_phase_seconds", "Duration of each startup phase of this worker.",
+               lambda: {(phase,): seconds for phase, seconds in startup_phases.items()}, ["phase"]))
+
+def record_pool_wait(seconds: float):
+    db_pool_checkout_wait.observe(seconds)
+    record_phase("pool", seconds)
+
+def instrument_engine(engine):
+    # Hooks the sync Engine (for an AsyncEngine pass engine.sync_engine)
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_statements_total.inc()
+        db_statement_duration.observe(elapsed)
+        record_phase("db", elapsed)
+        timings = request_timings.get()
+        if timings is not None:
+            timings["db_statements"] = timings.get("db_statements", 0) + 1
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.items() if phase != "db_statements"]
+    if "db_statements" in timings:
+        parts.append(f'db_statements;desc="{int(timings["db_statements"])}"')
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    # Pure ASGI middleware so the request context (and its timings dict) reaches the route unchanged
+    def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing_header(timings, time.perf_counter() - started).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The route template keeps label cardinality bounded; unmatched paths share one label
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            http_requests_total.inc(1.0, scope["method"], route_path, str(status))
+            http_request_duration.observe(elapsed, scope["method"], route_path)
+            request_timings.reset(token)
@@ -0,0 +1,269 @@
+import argparse, logging, time
+from sqlalchemy import LargeBinary, String, bindparam, column, delete, inspect, select, table, text, update
+from database import engine, SessionLocal
+from models import SocialMediaInfo
+from AES import classify_legacy
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Expand/contract migration of social_media_info."pageURL"/"pageID" (hex text) into
+# "pageURL_enc"/"pageID_enc" (raw bytes), run while the application stays online:
+#   1. prepare   - add the binary columns, relax NOT NULL on the hex columns and, on PostgreSQL, add a trigger
+#                  that fills the binary columns of every row the old version inserts or updates from now on
+#   2. copy      - rewrite hex rows into the binary columns in sid-ordered batches (resumable)
+#   3. deploy the application version that maps SocialMediaInfo onto the binary columns; it reads only the
+#      binary columns, so every row has to have them by then
+#   4. copy      - once more, as a check: it should find nothing left
+#   5. mark --unclassified, once no old version runs any more (see below)
+#   6. finalize  - enforce NOT NULL on the binary columns, drop the trigger and the hex columns
+#                  (SQLite cannot drop UNIQUE columns, so there the table is rebuilt from the model instead)
+# Legacy CBC values get their version byte on the way (AES.classify_legacy). Binary columns filled by a copy
+# that predates the version byte are fixed in place by a full mark, which has to run before deploying an
+# application version that requires it.
+# The trigger has no key, so it cannot check a GCM tag: a value in whole blocks that does not start with a GCM
+# version byte is CBC and gets its version byte, any other value is copied as is, and the whole-block ones among
+# those (CBC whose IV starts with 0x01/0x02, about 1 in 128, or GCM of a matching length) are listed in
+# social_media_info_unclassified for mark. Until it has run, the new version fails to decrypt those rows if they
+# are CBC; finalize refuses to run while the list is not empty.
+COLUMNS = {"pageURL": "pageURL_enc", "pageID": "pageID_enc"}
+
+social_media_info = table(
+    "social_media_info",
+    column("sid"),
+    column("pageURL", String),
+    column("pageID", String),
+    column("pageURL_enc", LargeBinary),
+    column("pageID_enc", LargeBinary),
+)
+
+unclassified = table("social_media_info_unclassified", column("sid"))
+
+CREATE_UNCLASSIFIED = "CREATE TABLE IF NOT EXISTS social_media_info_unclassified (sid INTEGER PRIMARY KEY)"
+CLASSIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION social_media_info_classify_ciphertext(value bytea) RETURNS bytea AS $$
+BEGIN
+    IF mod(length(value), 16) = 0 AND get_byte(value, 0) NOT IN (1, 2) THEN
+        RETURN decode('00', 'hex') || value;
+    END IF;
+    RETURN value;
+END
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+COPY_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION social_media_info_copy_ciphertext() RETURNS trigger AS $$
+BEGIN
+    IF NEW."pageURL" IS NOT NULL AND (TG_OP = 'INSERT' OR NEW."pageURL" IS DISTINCT FROM OLD."pageURL") THEN
+        NEW."pageURL_enc" := social_media_info_classify_ciphertext(decode(NEW."pageURL", 'hex'));
+    END IF;
+    IF NEW."pageID" IS NOT NULL AND (TG_OP = 'INSERT' OR NEW."pageID" IS DISTINCT FROM OLD."pageID") THEN
+        NEW."pageID_enc" := social_media_info_classify_ciphertext(decode(NEW."pageID", 'hex'));
+    END IF;
+    IF (NEW."pageURL" IS NOT NULL OR NEW."pageID" IS NOT NULL)
+            AND (mod(length(NEW."pageURL_enc"), 16) = 0 OR mod(length(NEW."pageID_enc"), 16) = 0) THEN
+        INSERT INTO social_media_info_unclassified (sid) VALUES (NEW.sid) ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+COPY_TRIGGER = (
+    "CREATE TRIGGER social_media_info_copy_ciphertext BEFORE INSERT OR UPDATE ON social_media_info "
+    "FOR EACH ROW EXECUTE PROCEDURE social_media_info_copy_ciphertext()"
+)
+DROP_COPY_TRIGGER = "DROP TRIGGER IF EXISTS social_media_info_copy_ciphertext ON social_media_info"
+DROP_COPY_TRIGGER_FUNCTION = "DROP FUNCTION IF EXISTS social_media_info_copy_ciphertext()"
+DROP_CLASSIFY_FUNCTION = "DROP FUNCTION IF EXISTS social_media_info_classify_ciphertext(bytea)"
+DROP_UNCLASSIFIED = "DROP TABLE IF EXISTS social_media_info_unclassified"
+
+def existing_columns() -> set:
+    return {column_info["name"] for column_info in inspect(engine).get_columns("social_media_info")}
+
+def prepare():
+    columns = existing_columns()
+    binary_type = LargeBinary().compile(dialect=engine.dialect)
+    with engine.begin() as connection:
+        for legacy_column, binary_column in COLUMNS.items():
+            if binary_column not in columns:
+                logger.info("Adding column social_media_info.%s...", binary_column)
+                connection.execute(text(f'ALTER TABLE social_media_info ADD COLUMN "{binary_column}" {binary_type}'))
+            if legacy_column in columns and engine.dialect.name == "postgresql":
+                # New application versions no longer write the hex columns
+                connection.execute(text(f'ALTER TABLE social_media_info ALTER COLUMN "{legacy_column}" DROP NOT NULL'))
+        if "pageURL" in columns and engine.dialect.name == "postgresql":
+            logger.info("Adding trigger social_media_info_copy_ciphertext...")
+            connection.execute(text(CREATE_UNCLASSIFIED))
+            connection.execute(text(CLASSIFY_FUNCTION))
+            connection.execute(text(COPY_TRIGGER_FUNCTION))
+            connection.execute(text(DROP_COPY_TRIGGER))
+            connection.execute(text(COPY_TRIGGER))
+    if engine.dialect.name != "postgresql":
+        logger.warning("%s cannot relax NOT NULL in place; deploy the new version only after finalize.", engine.dialect.name)
+
+def copy(batch_size: int = 1000, pause: float = 0.0) -> int:
+    if "pageURL" not in existing_columns():
+        logger.info("Hex columns already dropped, nothing to copy.")
+        return 0
+    last_sid = 0
+    copied = 0
+    statement = (
+        update(social_media_info)
+        .where(social_media_info.c.sid == bindparam("row_sid"))
+        .values(pageURL_enc=bindparam("url_bytes"), pageID_enc=bindparam("id_bytes"))
+    )
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(social_media_info.c.sid, social_media_info.c.pageURL, social_media_info.c.pageID)
+                .where(social_media_info.c.sid > last_sid)
+                .where(social_media_info.c.pageURL_enc.is_(None))
+                .where(social_media_info.c.pageURL.is_not(None))
+                .order_by(social_media_info.c.sid)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(statement, [
+                {"row_sid": row.sid, "url_bytes": classify_legacy(row.pageURL), "id_bytes": classify_legacy(row.pageID)}
+                for row in rows
+            ])
+            db.commit()
+        copied += len(rows)
+        last_sid = rows[-1].sid
+        logger.info("Rewrote ciphertext up to sid %s (%d rows so far)", last_sid, copied)
+        if pause:
+            # Leaves headroom for production traffic between batches
+            time.sleep(pause)
+    return copied
+
+def mark_unclassified(batch_size: int = 1000, pause: float = 0.0) -> int:
+    # Classifies the rows the trigger could not, and takes them off its list in the same transaction
+    if "social_media_info_unclassified" not in inspect(engine).get_table_names():
+        return 0
+    marked = 0
+    statement = (
+        update(social_media_info)
+        .where(social_media_info.c.sid == bindparam("row_sid"))
+        .values(pageURL_enc=bindparam("url_bytes"), pageID_enc=bindparam("id_bytes"))
+    )
+    while True:
+        with SessionLocal() as db:
+            sids = db.execute(select(unclassified.c.sid).order_by(unclassified.c.sid).limit(batch_size)).scalars().all()
+            if not sids:
+                break
+            rows = db.execute(
+                select(social_media_info.c.sid, social_media_info.c.pageURL_enc, social_media_info.c.pageID_enc)
+                .where(social_media_info.c.sid.in_(sids))
+            ).all()
+            batch = [
+                {"row_sid": row.sid, "url_bytes": classify_legacy(row.pageURL_enc), "id_bytes": classify_legacy(row.pageID_enc)}
+                for row in rows
+            ]
+            if batch:
+                db.execute(statement, batch)
+            db.execute(delete(unclassified).where(unclassified.c.sid.in_(sids)))
+            db.commit()
+        marked += len(batch)
+        logger.info("Classified %d rows listed by the trigger so far", marked)
+        if pause:
+            time.sleep(pause)
+    return marked
+
+def mark(batch_size: int = 1000, pause: float = 0.0) -> int:
+    marked = mark_unclassified(batch_size, pause)
+    last_sid = 0
+    scanned = 0
+    marked = 0
+    statement = (
+        update(social_media_info)
+        .where(social_media_info.c.sid == bindparam("row_sid"))
+        .values(pageURL_enc=bindparam("url_bytes"), pageID_enc=bindparam("id_bytes"))
+    )
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(social_media_info.c.sid, social_media_info.c.pageURL_enc, social_media_info.c.pageID_enc)
+                .where(social_media_info.c.sid > last_sid)
+                .where(social_media_info.c.pageURL_enc.is_not(None))
+                .order_by(social_media_info.c.sid)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            batch = []
+            for row in rows:
+                url_bytes, id_bytes = classify_legacy(row.pageURL_enc), classify_legacy(row.pageID_enc)
+                if url_bytes != bytes(row.pageURL_enc) or id_bytes != bytes(row.pageID_enc):
+                    batch.append({"row_sid": row.sid, "url_bytes": url_bytes, "id_bytes": id_bytes})
+            if batch:
+                db.execute(statement, batch)
+            db.commit()
+        scanned += len(rows)
+        marked += len(batch)
+        last_sid = rows[-1].sid
+        logger.info("Marked legacy ciphertext up to sid %s (%d of %d rows rewritten)", last_sid, marked, scanned)
+        if pause:
+            time.sleep(pause)
+    return marked
+
+def rebuild_without_hex_columns(connection, columns: set):
+    # SQLite cannot drop the UNIQUE hex columns, so the table is recreated from the model and its rows copied over.
+    # Nothing references social_media_info, so the rename leaves no foreign key behind.
+    kept = ", ".join(f'"{table_column.name}"' for table_column in SocialMediaInfo.__table__.columns if table_column.name in columns)
+    logger.info("Rebuilding social_media_info without the hex columns...")
+    connection.execute(text("ALTER TABLE social_media_info RENAME TO social_media_info_old"))
+    for index in inspect(connection).get_indexes("social_media_info_old"):
+        connection.execute(text(f'DROP INDEX "{index["name"]}"'))
+    SocialMediaInfo.__table__.create(bind=connection)
+    connection.execute(text(f"INSERT INTO social_media_info ({kept}) SELECT {kept} FROM social_media_info_old"))
+    connection.execute(text("DROP TABLE social_media_info_old"))
+
+def finalize():
+    columns = existing_columns()
+    with engine.begin() as connection:
+        if "pageURL" in columns:
+            remaining = connection.execute(
+                select(social_media_info.c.sid).where(social_media_info.c.pageURL_enc.is_(None)).limit(1)
+            ).first()
+            if remaining:
+                raise RuntimeError(f"Row sid {remaining.sid} has no binary ciphertext yet. Run 'copy' before 'finalize'.")
+        if engine.dialect.name == "postgresql":
+            connection.execute(text(DROP_COPY_TRIGGER))
+            if "social_media_info_unclassified" in inspect(connection).get_table_names():
+                pending = connection.execute(select(unclassified.c.sid).limit(1)).first()
+                if pending:
+                    raise RuntimeError(f"Row sid {pending.sid} was written by the old version and is not classified yet. "
+                                       "Run 'mark --unclassified' before 'finalize'.")
+            connection.execute(text(DROP_COPY_TRIGGER_FUNCTION))
+            connection.execute(text(DROP_CLASSIFY_FUNCTION))
+            connection.execute(text(DROP_UNCLASSIFIED))
+        if engine.dialect.name == "sqlite":
+            if "pageURL" in columns:
+                rebuild_without_hex_columns(connection, columns)
+            return
+        for legacy_column, binary_column in COLUMNS.items():
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(f'ALTER TABLE social_media_info ALTER COLUMN "{binary_column}" SET NOT NULL'))
+            if legacy_column in columns:
+                logger.info("Dropping column social_media_info.%s...", legacy_column)
+                connection.execute(text(f'ALTER TABLE social_media_info DROP COLUMN "{legacy_column}"'))
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Move SocialMediaInfo ciphertext from hex text to binary columns.")
+    parser.add_argument("step", choices=["prepare", "copy", "mark", "finalize"])
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows rewritten per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--unclassified", action="store_true", help="mark: only the rows the trigger listed")
+    args = parser.parse_args()
+    if args.step == "prepare":
+        prepare()
+    elif args.step == "copy":
+        count = copy(args.batch_size, args.pause)
+        logger.info("Ciphertext copy completed: %d rows rewritten", count)
+    elif args.step == "mark":
+        count = mark_unclassified(args.batch_size, args.pause) if args.unclassified else mark(args.batch_size, args.pause)
+        logger.info("Legacy ciphertext marking completed: %d rows rewritten", count)
+    else:
+        finalize()
+    logger.info("Step '%s' completed successfully", args.step)
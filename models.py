@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -17,6 +17,12 @@ class PersonalInfo(Base):
 
 class HotelInfo(Base):
     __tablename__ = "hotel_info"
+    # GET /hotels filters: each index ends in hid so a filtered keyset page is one index range scan
+    __table_args__ = (
+        Index("ix_hotel_info_marsha_code_hid", "marsha_code", "hid"),
+        Index("ix_hotel_info_location_hid", "country", "state", "city", "hid"),
+        Index("ix_hotel_info_managed_franchise_hid", "managed_franchise", "hid"),
+    )
     hid = Column(Integer, primary_key=True, index=True, autoincrement=True)
     hotel_name = Column(String, nullable=False)
     marsha_code = Column(String, nullable=False)
@@ -53,13 +59,22 @@ class PlatformInfo(Base):
 
 class SocialMediaInfo(Base):
     __tablename__ = "social_media_info"
+    # (hid, plid) serves record graph loads by hotel, (plid, hid) the GET /hotels platform filter
+    __table_args__ = (
+        Index("ix_social_media_info_hid_plid", "hid", "plid"),
+        Index("ix_social_media_info_plid_hid", "plid", "hid"),
+    )
     sid = Column(Integer, primary_key=True, index=True, autoincrement=True)
     sma_name = Column(String, nullable=False)
     sma_person = Column(String, nullable=False)
     sma_email = Column(String, nullable=False)
     sma_phone = Column(String, nullable=False)
-    pageURL = Column(String, nullable=False, unique=True)
-    pageID = Column(String, nullable=False, unique=True)
+    # Raw AES-GCM ciphertext (AES.encrypt_many); uniqueness is enforced on the blind indexes below
+    pageURL = Column("pageURL_enc", LargeBinary, nullable=False)
+    pageID = Column("pageID_enc", LargeBinary, nullable=False)
+    # HMAC blind indexes of the plaintext pageURL/pageID (AES.blind_index); nullable until backfilled
+    pageURL_bidx = Column(String(64), nullable=True, unique=True, index=True)
+    pageID_bidx = Column(String(64), nullable=True, unique=True, index=True)
     mi_fbm = Column(Boolean, nullable=False, default=False)
     added_dcube = Column(Boolean, nullable=False, default=False)
     hid = Column(Integer, ForeignKey("hotel_info.hid"), nullable=False)
@@ -67,3 +82,37 @@ class SocialMediaInfo(Base):
     # Many-to-one relationship with HotelInfo & PlatformInfo
     hotel_info = relationship("HotelInfo", back_populates="social_media_info")
     platform_info = relationship("PlatformInfo", back_populates="social_media_info")
+
+class RecordDocument(Base):
+    # Materialized get_info response, written in the same transaction as the record itself.
+    # The whole document is one AES.encrypt blob, so a read is one primary key lookup plus one decrypt.
+    __tablename__ = "record_document"
+    eid = Column(String, ForeignKey("personal_info.eid"), primary_key=True)
+    document = Column(LargeBinary, nullable=False)
+
+class ArchivedRecord(Base):
+    # Tombstone of a record moved to an archive segment (archive_records.py). Deleting the hot rows frees their
+    # unique values; the insert conflict checks consult these tables while ARCHIVE_PATH is set.
+    __tablename__ = "archived_record"
+    eid = Column(String, primary_key=True)
+    personal_email = Column(String, nullable=False, unique=True)
+    personal_phone = Column(String, nullable=False, unique=True)
+
+class ArchivedPage(Base):
+    # Blind indexes of an archived record's pages
+    __tablename__ = "archived_page"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    eid = Column(String, ForeignKey("archived_record.eid"), nullable=False, index=True)
+    pageURL_bidx = Column(String(64), nullable=True, unique=True, index=True)
+    pageID_bidx = Column(String(64), nullable=True, unique=True, index=True)
+
+class KeyRotationCheckpoint(Base):
+    # Progress of rotate_keys.py per table and target key id, committed in the same transaction as each batch
+    __tablename__ = "key_rotation_checkpoint"
+    table_name = Column(String, primary_key=True)
+    key_id = Column(Integer, primary_key=True)
+    # Keyset position: the last primary key value visited, as text
+    last_key = Column(String, nullable=True)
+    rotated = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, nullable=False)
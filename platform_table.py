@@ -1,11 +1,13 @@
-import logging
-from database import get_db
-from config import LOG_LEVEL
+import logging, threading, time
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional
+from database import get_db, SessionLocal
 from sqlalchemy.orm import Session
 from models import PlatformInfo
+import statements
+from config import PLATFORM_REGISTRY_TTL, PLATFORM_REFRESH_INTERVAL
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 
-logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 platforms = ["Facebook", "Instagram", "LinkedIn", "Pinterest", "TikTok", "Twitter", "YouTube", "Other", "I don't know"]
@@ -27,9 +29,89 @@ def populate_platform_info():
                 db.commit()
                 logger.info("PlatformInfo table populated successfully!")
     except Exception as e:
-        logger.exception(f"Error populating PlatformInfo table: {e}")
+        logger.exception("Error populating PlatformInfo table: %s", e)
         raise
 
+class PlatformRegistry:
+    # Immutable name <-> plid view of PlatformInfo; replaced wholesale on refresh, never mutated
+    __slots__ = ("_by_name", "_by_id")
+
+    def __init__(self, platforms: Dict[str, int]):
+        self._by_name = MappingProxyType(dict(platforms))
+        self._by_id = MappingProxyType({plid: name for name, plid in platforms.items()})
+
+    @property
+    def by_name(self) -> Mapping[str, int]:
+        return self._by_name
+
+    @property
+    def by_id(self) -> Mapping[int, str]:
+        return self._by_id
+
+    def plid(self, platform_name: str) -> Optional[int]:
+        return self._by_name.get(platform_name)
+
+    def name(self, plid: int) -> Optional[str]:
+        return self._by_id.get(plid)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+# Each worker process holds its own registry. Platforms added after startup reach a worker when it misses
+# a name (at most once per PLATFORM_REFRESH_INTERVAL) or when its copy is older than PLATFORM_REGISTRY_TTL.
+_registry: Optional[PlatformRegistry] = None
+_registry_loaded_at = 0.0
+_registry_lock = threading.Lock()
+
+def load_platform_registry(db: Session = None) -> PlatformRegistry:
+    global _registry
+    try:
+        if db is None:
+            with SessionLocal() as session:
+                rows = session.execute(statements.platforms).all()
+        else:
+            rows = db.execute(statements.platforms).all()
+    except Exception as e:
+        logger.exception("Error loading PlatformInfo registry: %s", e)
+        raise
+    global _registry_loaded_at
+    registry = PlatformRegistry({row.platform_name: row.plid for row in rows})
+    with _registry_lock:
+        _registry = registry
+        _registry_loaded_at = time.monotonic()
+    logger.info("PlatformInfo registry loaded with %d platforms", len(registry))
+    return registry
+
+# Explicit hook for when platforms are added after startup; reloads the calling worker's registry only
+def refresh_platform_registry() -> PlatformRegistry:
+    return load_platform_registry()
+
+def get_platform_registry() -> PlatformRegistry:
+    registry = _registry
+    if registry is None:
+        # Scripts and workers that skipped the lifespan hook load it on first use
+        with _registry_lock:
+            registry = _registry
+        if registry is None:
+            registry = load_platform_registry()
+    elif time.monotonic() - _registry_loaded_at > PLATFORM_REGISTRY_TTL:
+        registry = load_platform_registry()
+    return registry
+
+def platform_registry_for(platform_names: Iterable[str]) -> PlatformRegistry:
+    # Names come from requests, so a miss refreshes at most once per interval instead of on every bad name
+    registry = get_platform_registry()
+    if any(registry.plid(name) is None for name in platform_names) and time.monotonic() - _registry_loaded_at > PLATFORM_REFRESH_INTERVAL:
+        registry = load_platform_registry()
+    return registry
+
+def resolve_platform_name(plid: int) -> Optional[str]:
+    # plids come from stored rows, so a miss means the registry is stale rather than bad input
+    name = get_platform_registry().name(plid)
+    if name is None:
+        name = refresh_platform_registry().name(plid)
+    return name
+
 # def populate_platform_info_session(db: Session):
 #     logger.info("Checking if PlatformInfo table is empty...")
 #     if db.query(PlatformInfo).count() > 0:
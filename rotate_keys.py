@@ -0,0 +1,114 @@
+import argparse, datetime, logging, time
+from sqlalchemy import inspect, select, update
+from database import engine, SessionLocal
+from models import SocialMediaInfo, RecordDocument, KeyRotationCheckpoint
+from AES import ACTIVE_KEY_ID, decrypt_many, encrypt_many, needs_rotation
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Online re-encryption of stored ciphertext onto the active AES key. Rolling a new key out:
+#   1. deploy every worker with the new key in AES_KEYS and AES_ACTIVE_KEY_ID still on the old id
+#   2. deploy with AES_ACTIVE_KEY_ID on the new id; new writes use it, reads accept both keys
+#   3. run this job; it walks each table in primary key order, one short transaction per batch,
+#      and records its position in key_rotation_checkpoint so a rerun resumes where it stopped
+#   4. drop the old key from AES_KEYS; key id 0 is retired by unsetting AES_KEY, which needs BLIND_INDEX_KEY
+#      set (pinned to the value derived from AES_KEY, or a new key followed by backfill_blind_index.py --reindex)
+# Plaintext does not change, so blind indexes, record documents' contents and caches stay valid.
+TARGETS = {
+    "social_media_info": (SocialMediaInfo, SocialMediaInfo.sid, int, ["pageURL", "pageID"]),
+    "record_document": (RecordDocument, RecordDocument.eid, str, ["document"]),
+}
+
+def load_checkpoint(db, table_name: str) -> KeyRotationCheckpoint:
+    checkpoint = db.get(KeyRotationCheckpoint, (table_name, ACTIVE_KEY_ID))
+    if checkpoint is None:
+        checkpoint = KeyRotationCheckpoint(table_name=table_name, key_id=ACTIVE_KEY_ID, last_key=None, rotated=0,
+                                           completed=False, updated_at=datetime.datetime.utcnow())
+        db.add(checkpoint)
+    return checkpoint
+
+def rotate_table(table_name: str, batch_size: int = 500, rows_per_second: float = 1000.0,
+                 max_batch_seconds: float = 0.5) -> int:
+    model, key_column, parse_key, attributes = TARGETS[table_name]
+    with SessionLocal() as db:
+        checkpoint = load_checkpoint(db, table_name)
+        db.commit()
+        if checkpoint.completed:
+            logger.info("%s is already rotated onto key id %d", table_name, ACTIVE_KEY_ID)
+            return 0
+        last_key = parse_key(checkpoint.last_key) if checkpoint.last_key is not None else None
+
+    scanned = 0
+    rotated = 0
+    started = time.monotonic()
+    while True:
+        batch_started = time.monotonic()
+        with SessionLocal() as db:
+            statement = select(key_column, *(getattr(model, name) for name in attributes)).order_by(key_column).limit(batch_size)
+            if last_key is not None:
+                statement = statement.where(key_column > last_key)
+            rows = db.execute(statement).all()
+            checkpoint = load_checkpoint(db, table_name)
+            if not rows:
+                checkpoint.completed = True
+                checkpoint.updated_at = datetime.datetime.utcnow()
+                db.commit()
+                break
+            stale = [row for row in rows if any(needs_rotation(value) for value in row[1:])]
+            if stale:
+                # Decrypt and re-encrypt the whole batch in one call each
+                plaintexts = decrypt_many([value for row in stale for value in row[1:]])
+                ciphertexts = iter(encrypt_many(plaintexts))
+                db.execute(update(model), [
+                    {key_column.key: row[0], **{name: next(ciphertexts) for name in attributes}}
+                    for row in stale
+                ])
+            last_key = rows[-1][0]
+            # The checkpoint commits with the rewritten rows, so a crash never skips or repeats a batch
+            checkpoint.last_key = str(last_key)
+            checkpoint.rotated += len(stale)
+            checkpoint.updated_at = datetime.datetime.utcnow()
+            db.commit()
+        scanned += len(rows)
+        rotated += len(stale)
+        logger.info("Rotated %s up to %s (%d of %d rows rewritten)", table_name, last_key, rotated, scanned)
+
+        # Shorter transactions hold row locks for less time; a slow batch halves the next one
+        if time.monotonic() - batch_started > max_batch_seconds and batch_size > 10:
+            batch_size //= 2
+            logger.info("Batch took longer than %.2fs, reducing batch size to %d", max_batch_seconds, batch_size)
+        # Holds the average scan rate at rows_per_second, leaving the rest of the database to production traffic
+        delay = scanned / rows_per_second - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+    return rotated
+
+def rotate_keys(tables=None, batch_size: int = 500, rows_per_second: float = 1000.0,
+                max_batch_seconds: float = 0.5, restart: bool = False) -> int:
+    KeyRotationCheckpoint.__table__.create(bind=engine, checkfirst=True)
+    existing_tables = set(inspect(engine).get_table_names())
+    if restart:
+        with SessionLocal() as db:
+            db.query(KeyRotationCheckpoint).filter(KeyRotationCheckpoint.key_id == ACTIVE_KEY_ID).delete()
+            db.commit()
+    rotated = 0
+    for table_name in tables or TARGETS:
+        if table_name not in existing_tables:
+            logger.info("Skipping %s, the table does not exist", table_name)
+            continue
+        rotated += rotate_table(table_name, batch_size, rows_per_second, max_batch_seconds)
+    return rotated
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Re-encrypt stored ciphertext onto the active AES key.")
+    parser.add_argument("--table", action="append", choices=list(TARGETS), help="Table to rotate (repeatable, default all)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows read per transaction")
+    parser.add_argument("--rows-per-second", type=float, default=1000.0, help="Target average scan rate")
+    parser.add_argument("--max-batch-seconds", type=float, default=0.5, help="Batch duration above which the batch size is halved")
+    parser.add_argument("--restart", action="store_true", help="Discard checkpoints for the active key and start over")
+    args = parser.parse_args()
+    logger.info("Rotating ciphertext onto AES key id %d", ACTIVE_KEY_ID)
+    count = rotate_keys(args.table, args.batch_size, args.rows_per_second, args.max_batch_seconds, args.restart)
+    logger.info("Key rotation completed: %d rows re-encrypted", count)
@@ -1,8 +1,90 @@
-from pydantic import BaseModel, model_validator
-from typing import Optional, Dict, List
+from pydantic import BaseModel, ValidationError, model_validator
+from metrics import timed
+from typing import Any, Optional, Dict, List, NamedTuple, Pattern, Tuple, Union
 from fastapi import HTTPException
 import re
 
+# Every rule is compiled once at import and a payload is checked in a single pass that collects
+# all field errors, so a client sees every problem in one 422 instead of one per resubmission
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_PATTERN = re.compile(r'^\d{10}$')
+URL_PATTERN = re.compile(r'^https://www\..*\.com(/.*)?')
+
+EMAIL_MESSAGE = "Invalid email structure for {}. It should follow structure: user@example.com"
+PHONE_MESSAGE = "Invalid phone number for {}. It must be exactly 10 digits."
+URL_MESSAGE = "Invalid URL for {}."
+
+class FieldRule(NamedTuple):
+    field: str
+    section: str
+    pattern: Optional[Pattern] = None
+    message: Optional[str] = None
+
+PERSONAL_RULES = (
+    FieldRule("first_name", "PersonalInfo"),
+    FieldRule("last_name", "PersonalInfo"),
+    FieldRule("title", "PersonalInfo"),
+    FieldRule("personal_email", "PersonalInfo", EMAIL_PATTERN, EMAIL_MESSAGE),
+    FieldRule("eid", "PersonalInfo"),
+    FieldRule("country_code", "PersonalInfo"),
+    FieldRule("personal_phone", "PersonalInfo", PHONE_PATTERN, PHONE_MESSAGE),
+    FieldRule("hotel_name", "HotelInfo"),
+    FieldRule("marsha_code", "HotelInfo"),
+    FieldRule("managed_franchise", "HotelInfo"),
+    FieldRule("country", "HotelInfo"),
+    FieldRule("state", "HotelInfo"),
+    FieldRule("city", "HotelInfo"),
+    FieldRule("zip_code", "HotelInfo"),
+)
+# Required unless not_applicable is set; the formats are checked whenever a value is given
+AGENCY_RULES = (
+    FieldRule("agency_name", "AgencyInfo"),
+    FieldRule("primary_contact", "AgencyInfo"),
+    FieldRule("primary_email", "AgencyInfo", EMAIL_PATTERN, EMAIL_MESSAGE),
+    FieldRule("primary_phone", "AgencyInfo", PHONE_PATTERN, PHONE_MESSAGE),
+)
+SOCIAL_MEDIA_RULES = (
+    FieldRule("sma_name", "SocialMediaInfo"),
+    FieldRule("sma_person", "SocialMediaInfo"),
+    FieldRule("sma_email", "SocialMediaInfo", EMAIL_PATTERN, EMAIL_MESSAGE),
+    FieldRule("sma_phone", "SocialMediaInfo", PHONE_PATTERN, PHONE_MESSAGE),
+    FieldRule("pageURL", "SocialMediaInfo", URL_PATTERN, URL_MESSAGE),
+    FieldRule("pageID", "SocialMediaInfo"),
+)
+
+def check_fields(values: dict, rules: Tuple[FieldRule, ...], loc: tuple, errors: List[dict], required: bool = True):
+    for rule in rules:
+        value = values.get(rule.field)
+        if not value:
+            if required:
+                errors.append({"loc": [*loc, rule.field], "msg": f"Missing '{rule.field}' from '{rule.section}'"})
+        # Non-string values are left to the field type check
+        elif rule.pattern is not None and isinstance(value, str) and not rule.pattern.match(value):
+            errors.append({"loc": [*loc, rule.field], "msg": rule.message.format(value)})
+
+def check_social_media(values: dict, loc: tuple, errors: List[dict]):
+    check_fields(values, SOCIAL_MEDIA_RULES, loc, errors)
+    mi_fbm = values.get('mi_fbm')
+    if mi_fbm:
+        values['added_dcube'] = True
+    elif mi_fbm is False and values.get('added_dcube') is None:
+        errors.append({"loc": [*loc, "added_dcube"], "msg": "added_dcube must be specified if MI FBM is No."})
+    elif mi_fbm is None:
+        errors.append({"loc": [*loc, "mi_fbm"], "msg": "mi_fbm is a required field."})
+
+def check_payload(values: dict) -> List[dict]:
+    errors: List[dict] = []
+    check_fields(values, PERSONAL_RULES, (), errors)
+    check_fields(values, AGENCY_RULES, (), errors, required=not values.get('not_applicable'))
+    platform_inputs = values.get('platform_inputs')
+    if not platform_inputs:
+        errors.append({"loc": ["platform_inputs"], "msg": "At least one platform input is required."})
+    elif isinstance(platform_inputs, dict):
+        for platform_name, social_media in platform_inputs.items():
+            if isinstance(social_media, dict):
+                check_social_media(social_media, ("platform_inputs", platform_name), errors)
+    return errors
+
 class Base(BaseModel):
     first_name: str
     last_name: str
@@ -24,63 +106,6 @@ class Base(BaseModel):
     primary_phone: Optional[str] = None
     not_applicable: Optional[bool] = None
 
-    @model_validator(mode='before')
-    def validate_personalFields(cls, values: dict):
-        required_fields = ["first_name", "last_name", "title", "personal_email", "eid", "country_code", "personal_phone"]
-        missing_fields = [field for field in required_fields if not values.get(field)]
-        try:
-            if missing_fields:
-                raise HTTPException(status_code=422, detail=f"Missing '{', '.join(missing_fields)}' from 'PersonalInfo'")
-        except Exception as e:
-             raise
-        return values
-    
-    @model_validator(mode='before')
-    def validate_hotelFields(cls, values: dict):
-        required_fields = ["hotel_name", "marsha_code", "managed_franchise", "country", "state", "city", "zip_code"]
-        missing_fields = [field for field in required_fields if not values.get(field)]
-        try:
-            if missing_fields:
-                raise HTTPException(status_code=422, detail=f"Missing '{', '.join(missing_fields)}' from 'HotelInfo'")
-        except Exception as e:
-             raise
-        return values
-
-    @model_validator(mode='before')
-    def validate_agencyFields(cls, values: dict):
-        not_applicable = values.get('not_applicable')
-        try:
-            if not not_applicable:
-                missing_fields = [field for field in ['agency_name', 'primary_contact', 'primary_email', 'primary_phone'] if not values.get(field)]
-                if missing_fields:
-                    raise HTTPException(status_code=422, detail=f"Missing '{', '.join(missing_fields)}' from 'AgencyInfo'")
-        except Exception as e:
-            raise 
-        return values
-    
-    @model_validator(mode='before')
-    def validate_email_phone(cls, values: dict):
-        try:
-            personal_email = values.get('personal_email')
-            if personal_email:
-                    if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', personal_email):
-                        raise HTTPException(status_code=422, detail=f"Invalid email structure for {personal_email}. It should follow structure: user@example.com")
-            personal_phone = values.get('personal_phone')
-            if personal_phone:
-                    if not re.match(r'^\d{10}$', personal_phone):
-                        raise HTTPException(status_code=422, detail=f"Invalid phone number for {personal_phone}. It must be exactly 10 digits.")
-            primary_email = values.get('primary_email')
-            if primary_email:
-                    if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',  primary_email):
-                        raise HTTPException(status_code=422, detail=f"Invalid email structure for {primary_email}. It should follow structure: user@example.com")
-            primary_phone = values.get('primary_phone')
-            if primary_phone:
-                    if not re.match(r'^\d{10}$', primary_phone):
-                        raise HTTPException(status_code=422, detail=f"Invalid phone number for {primary_phone}. It must be exactly 10 digits.")
-        except Exception as e:
-            raise
-        return values
-
 class SocialMediaModel(BaseModel):
     sma_name: str
     sma_person: str
@@ -91,46 +116,30 @@ class SocialMediaModel(BaseModel):
     mi_fbm: bool
     added_dcube: Optional[bool]
 
-    @model_validator(mode='before')
-    def validate_socialmediaFields(cls, values: dict):
-        required_fields = ["sma_name", "sma_person", "sma_email", "sma_phone", "pageURL", "pageID"]
-        missing_fields = [field for field in required_fields if not values.get(field)]
-        try:
-            if missing_fields:
-                raise HTTPException(status_code=422, detail=f"Missing '{', '.join(missing_fields)}' from 'SocialMediaInfo'")
-            sma_email = values.get('sma_email')
-            if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', sma_email):
-                raise HTTPException(status_code=422, detail=f"Invalid email structure for {sma_email}. It should follow structure: user@example.com")
-            sma_phone = values.get('sma_phone')
-            if not re.match(r'^\d{10}$', sma_phone):
-                raise HTTPException(status_code=422, detail=f"Invalid phone number for {sma_phone}. It must be exactly 10 digits.")
-            pageURL = values.get('pageURL')
-            if not re.match(r'^https://www\..*\.com(/.*)?', pageURL):
-                raise HTTPException(status_code=422, detail=f"Invalid URL for {pageURL}.")
-            mi_fbm = values.get('mi_fbm')
-            added_dcube = values.get('added_dcube')
-            if mi_fbm:
-                values['added_dcube'] = True
-            elif mi_fbm is False and added_dcube is None:
-                raise HTTPException(status_code=422, detail="added_dcube must be specified if MI FBM is No.")
-            elif mi_fbm is None:
-                raise HTTPException(status_code=422, detail="mi_fbm is a required field.")
-        except Exception as e:
-            raise
-        return values
-
 class Create(Base):
     platform_inputs: Dict[str, SocialMediaModel]
 
-    @model_validator(mode="before")
-    def validate_platforms(cls, values: dict):
+    # Runs the whole rule set, nested platform inputs included, before the field types are checked
+    @model_validator(mode="wrap")
+    def validate_payload(cls, values, handler):
+        with timed("validation"):
+            if isinstance(values, dict):
+                errors = check_payload(values)
+                if errors:
+                    raise HTTPException(status_code=422, detail=errors)
+            return handler(values)
+
+def validate_many(records: List[Any]) -> Dict[int, Union[Create, Tuple[int, Any]]]:
+    # Validates an array of payloads; index -> Create, or index -> (status code, detail) for invalid ones
+    validated = {}
+    for index, record in enumerate(records):
         try:
-            platform_inputs = values.get('platform_inputs', {})
-            if not platform_inputs:
-                raise HTTPException(status_code=422, detail="At least one platform input is required.")
-        except Exception as e:
-            raise 
-        return values
+            validated[index] = Create.model_validate(record)
+        except HTTPException as e:
+            validated[index] = (e.status_code, e.detail)
+        except ValidationError as e:
+            validated[index] = (422, e.errors(include_url=False, include_context=False, include_input=False))
+    return validated
 
 class Response(Base):
     pid: int  
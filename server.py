@@ -0,0 +1,50 @@
+import argparse, logging, os, tempfile
+
+# Production entry point: N uvicorn worker processes, each importing main:app and so owning its own engine
+# and pools. main.py's own __main__ stays the single-process, auto-reloading development server.
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes.")
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to WEB_CONCURRENCY, or the CPU count")
+    args = parser.parse_args()
+    if args.workers is not None:
+        # Workers read the same count, so their share of DB_CONNECTION_BUDGET adds up
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+    import uvicorn
+    from config import HOST, PORT, WEB_CONCURRENCY, GRACEFUL_TIMEOUT, DB_CONNECTION_BUDGET, SKIP_BOOTSTRAP, INGEST_MODE
+    from database import ENGINES_PER_WORKER, pool_limits
+    from logging_setup import setup_logging
+    setup_logging()
+    logger = logging.getLogger("server")
+
+    if INGEST_MODE == "queue" and WEB_CONCURRENCY > 1:
+        # GET /info_input/{ticket} would 404 on every worker but the one that issued the ticket
+        parser.error(f"INGEST_MODE=queue keeps tickets in one worker's memory; run it with --workers 1, not {WEB_CONCURRENCY}.")
+    # Fails here, before any worker starts, when the budget cannot cover every worker
+    pool_size, max_overflow = pool_limits(WEB_CONCURRENCY)
+    logger.info(
+        "Starting %d workers on %s:%s; per engine pool_size=%d max_overflow=%d (%d engines per worker, budget %s)",
+        WEB_CONCURRENCY, HOST, PORT, pool_size, max_overflow, ENGINES_PER_WORKER, DB_CONNECTION_BUDGET or "unset"
+    )
+    if WEB_CONCURRENCY > 1 and not os.getenv("METRICS_DIR"):
+        # Lets whichever worker answers /metrics report every worker
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+    if not SKIP_BOOTSTRAP:
+        # Bootstraps the schema once here, instead of every worker racing to check and create it
+        from database import bootstrap, engine
+        from platform_table import populate_platform_info
+        bootstrap(populate_platform_info)
+        engine.dispose()
+        os.environ["SKIP_BOOTSTRAP"] = "true"
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        log_config=None
+    )
+
+if __name__ == "__main__":
+    main()
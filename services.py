@@ -1,29 +1,99 @@
-import logging
+import json, logging, re
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used without it
+    orjson = None
 from fastapi import HTTPException
+from sqlalchemy import event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.exc import NoResultFound
-from AES import encrypt, decrypt
-from schema import Create, Response, SocialMediaModel
-from models import PersonalInfo, HotelInfo, AgencyInfo, PlatformInfo, SocialMediaInfo
-from typing import Dict, List
-from config import LOG_LEVEL
-
-logging.basicConfig(level=LOG_LEVEL)
+from AES import encrypt_many, decrypt, decrypt_many, blind_index
+from schema import Create, Response, SocialMediaModel, validate_many
+from models import PersonalInfo, HotelInfo, AgencyInfo, SocialMediaInfo, RecordDocument
+from typing import Any, Dict, List, Optional, Set, Tuple
+from platform_table import platform_registry_for, resolve_platform_name
+from cache import info_cache
+from archive import record_archive
+import statements
+from config import INSERT_PRECHECK, RECORD_DOCUMENTS, INFO_ROW_TUPLES
+
 logger = logging.getLogger(__name__)
 
+def invalidate_info(eid: str, db: Session):
+    # Dropped now and again once the transaction commits, so a read racing the write cannot re-cache stale data
+    info_cache.delete(eid)
+    db.info.setdefault("stale_eids", set()).add(eid)
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session: Session):
+    for eid in session.info.pop("stale_eids", ()):
+        info_cache.delete(eid)
+
+@event.listens_for(Session, "after_rollback")
+def discard_stale_eids(session: Session):
+    session.info.pop("stale_eids", None)
+
+# Unique constraint/index name (PostgreSQL) -> "table.column"; SQLite names the column in its message instead
+UNIQUE_CONSTRAINTS = {
+    "personal_info_personal_email_key": "personal_info.personal_email",
+    "personal_info_eid_key": "personal_info.eid",
+    "personal_info_personal_phone_key": "personal_info.personal_phone",
+    "ix_social_media_info_pageURL_bidx": "social_media_info.pageURL_bidx",
+    "ix_social_media_info_pageID_bidx": "social_media_info.pageID_bidx",
+}
+PERSONAL_UNIQUE_COLUMNS = {"personal_info.personal_email", "personal_info.eid", "personal_info.personal_phone"}
+SQLITE_UNIQUE_PATTERN = re.compile(r"UNIQUE constraint failed: (\w+\.\w+)")
+
+# Same 400 messages the conflict lookups produce
+CONFLICT_MESSAGES = {
+    "personal_info.personal_email": lambda input: f"Personal email '{input.personal_email}' already exists.",
+    "personal_info.eid": lambda input: f"Employee ID '{input.eid}' already exists.",
+    "personal_info.personal_phone": lambda input: f"Personal phone '{input.personal_phone}' already exists.",
+    "social_media_info.pageURL_bidx": lambda input: page_conflict_message("Page URL", [model.pageURL for model in input.platform_inputs.values()]),
+    "social_media_info.pageID_bidx": lambda input: page_conflict_message("Page ID", [model.pageID for model in input.platform_inputs.values()]),
+}
+
+def page_conflict_message(label: str, values: List[str]) -> str:
+    # The constraint names the column but not the row, so with several platforms every candidate is listed
+    if len(values) == 1:
+        return f"{label} '{values[0]}' already exists."
+    return f"One of the {label}s {', '.join(repr(value) for value in values)} already exists."
+
+def violated_unique_column(error: IntegrityError) -> Optional[str]:
+    # psycopg2 exposes the constraint on .diag, asyncpg on the exception SQLAlchemy re-raised from
+    constraint_name = (
+        getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+        or getattr(error.orig.__cause__, "constraint_name", None)
+    )
+    if constraint_name:
+        return UNIQUE_CONSTRAINTS.get(constraint_name)
+    match = SQLITE_UNIQUE_PATTERN.search(str(error.orig))
+    return match.group(1) if match else None
+
+def conflict_error(error: IntegrityError, input: Create) -> Exception:
+    # Unknown violations (foreign keys, NOT NULL, ...) are returned unchanged
+    message = CONFLICT_MESSAGES.get(violated_unique_column(error))
+    return HTTPException(status_code=400, detail=message(input)) if message else error
+
+def personal_conflict_error(error: IntegrityError, input: Create, db: Session) -> Exception:
+    # A record can collide on several columns and the database names whichever index it checked first, so the
+    # columns are probed again to report them in the precheck's order: email, eid, phone. Runs on the request's
+    # own session once the failed INSERT's savepoint has rolled back.
+    if violated_unique_column(error) in PERSONAL_UNIQUE_COLUMNS:
+        conflicts = find_personal_conflicts({0: input}, db)
+        if conflicts:
+            return HTTPException(status_code=400, detail=conflicts[0])
+    return conflict_error(error, input)
+
 def create_personalinfo(input: Create, db: Session) -> PersonalInfo:
-    existing_email = db.query(PersonalInfo).filter(PersonalInfo.personal_email == input.personal_email).first()
-    if existing_email:
-        raise HTTPException(status_code=400, detail=f"Personal email '{input.personal_email}' already exists.")
-
-    existing_eid = db.query(PersonalInfo).filter(PersonalInfo.eid == input.eid).first()
-    if existing_eid:
-        raise HTTPException(status_code=400, detail=f"Employee ID '{input.eid}' already exists.")
-    
-    existing_phone = db.query(PersonalInfo).filter(PersonalInfo.personal_phone == input.personal_phone).first()
-    if existing_phone:
-        raise HTTPException(status_code=400, detail=f"Personal phone '{input.personal_phone}' already exists.")
-    
+    # The unique constraints detect duplicates during the INSERT itself, which a concurrent writer cannot race;
+    # archive tombstones have no constraint on personal_info, so they need the lookup
+    if INSERT_PRECHECK or record_archive is not None:
+        conflicts = find_personal_conflicts({0: input}, db)
+        if conflicts:
+            raise HTTPException(status_code=400, detail=conflicts[0])
+
     personal_info = PersonalInfo(
         first_name=input.first_name,
         last_name=input.last_name,
@@ -34,11 +104,15 @@ def create_personalinfo(input: Create, db: Session) -> PersonalInfo:
         personal_phone=input.personal_phone
         )
     try:
-        db.add(personal_info)
-        db.flush()
-        logger.info(f"Created PersonalInfo with pid: {personal_info.pid}")
+        # The savepoint keeps the transaction usable after a unique violation, for personal_conflict_error
+        with db.begin_nested():
+            db.add(personal_info)
+            db.flush()
+        logger.debug("Created PersonalInfo with pid: %s", personal_info.pid)
+    except IntegrityError as e:
+        raise personal_conflict_error(e, input, db) from e
     except Exception as e:
-        logger.error(f"Error while creating personal info: {str(e)}")
+        logger.error("Error while creating personal info: %s", e)
         raise
     return personal_info
 
@@ -56,9 +130,9 @@ def create_hotelinfo(input: Create, db: Session, personal_info: PersonalInfo) ->
     try:
         db.add(hotel_info)
         db.flush()  # To get the hid
-        logger.info(f"Created HotelInfo with hid: {hotel_info.hid}")
+        logger.debug("Created HotelInfo with hid: %s", hotel_info.hid)
     except Exception as e:
-        logger.error(f"Error while creating personal info: {str(e)}")
+        logger.error("Error while creating hotel info: %s", e)
         raise
     return hotel_info
 
@@ -76,44 +150,101 @@ def create_agencyinfo(input: Create, db: Session, hotel_info: HotelInfo) -> Agen
         )
         db.add(agency_info)
         db.flush() 
-        logger.info(f"Created AgencyInfo with aid: {agency_info.aid}")
+        logger.debug("Created AgencyInfo with aid: %s", agency_info.aid)
     except Exception as e:
-        logger.error(f"Error while creating personal info: {str(e)}")
+        logger.error("Error while creating agency info: %s", e)
         raise
     else:
         return agency_info
 
-def find_platform(platform_inputs: Dict[str, SocialMediaModel], db: Session) -> Dict[str, int]:
+def find_platform(platform_inputs: Dict[str, SocialMediaModel]) -> Dict[str, int]:
+    # Resolved from the in-process PlatformInfo registry, no database round trip
     try:
-        platform_names = list(platform_inputs.keys())
-        platform_info_list = db.query(PlatformInfo).filter(PlatformInfo.platform_name.in_(platform_names)).all()
-        if len(platform_info_list) != len(platform_names):
-            missing_platforms = set(platform_names) - {platform_info.platform_name for platform_info in platform_info_list}
-            logger.error(f"Missing platforms: {', '.join(missing_platforms)}")
+        platform_ids = platform_registry_for(platform_inputs).by_name
+        missing_platforms = [platform_name for platform_name in platform_inputs if platform_name not in platform_ids]
+        if missing_platforms:
+            logger.warning("Missing platforms: %s", missing_platforms)
             raise HTTPException(status_code=400, detail=f"None of the platforms {', '.join(missing_platforms)} were found in PlatformInfo.")
-        platforms_obj = {plat_info.platform_name: plat_info.plid for plat_info in platform_info_list}
-        logger.info(f"Found platform IDs: {platforms_obj}")
-    except NoResultFound as e:
-        logger.error(f"No results found: {e}")
-        raise HTTPException(status_code=404, detail="No results found")
+        platforms_obj = {platform_name: platform_ids[platform_name] for platform_name in platform_inputs}
+        logger.debug("Found platform IDs: %s", platforms_obj, extra={"sample_key": "find_platform"})
     except Exception as e:
         raise
     return platforms_obj
 
-def create_socialmediainfo(input: Create, db: Session, hotel_info: HotelInfo) -> dict: 
-    for platform_name, social_media_model in input.platform_inputs.items():
-        # existing_pageURL = db.query(SocialMediaInfo).filter(decrypt(SocialMediaInfo.pageURL) == social_media_model.pageURL).first()
-        # if existing_pageURL:
-        #     raise HTTPException(status_code=400, detail=f"Page URL '{social_media_model.pageURL}' already exists.")
+def encrypt_pages(social_media_models: List[SocialMediaModel]) -> List[Tuple[bytes, bytes]]:
+    # Encrypts pageURL/pageID of every model in one batch
+    tokens = encrypt_many([value for model in social_media_models for value in (model.pageURL, model.pageID)])
+    return list(zip(tokens[0::2], tokens[1::2]))
+
+def decrypt_pages(social_media_info_list: List[SocialMediaInfo]) -> Dict[int, dict]:
+    # Decrypts pageURL/pageID of every row in one batch, keyed by plid
+    plaintexts = decrypt_many([token for smi in social_media_info_list for token in (smi.pageURL, smi.pageID)])
+    return {
+        smi.plid: {'pageURL': plaintexts[2 * position], 'pageID': plaintexts[2 * position + 1]}
+        for position, smi in enumerate(social_media_info_list)
+    }
+
+# With an archive, unique values of archived records stay taken: the probes also cover their tombstones
+PERSONAL_CONFLICTS = statements.personal_conflicts if record_archive is None else statements.personal_or_archived_conflicts
+EXISTING_PAGES = statements.existing_pages if record_archive is None else statements.existing_or_archived_pages
+
+def find_existing_pages(pageURL_indexes: Set[str], pageID_indexes: Set[str], db: Session) -> Tuple[Set[str], Set[str]]:
+    # Probes the blind index columns for both fields in a single query
+    if not pageURL_indexes and not pageID_indexes:
+        return set(), set()
+    rows = db.execute(
+        EXISTING_PAGES, {"pageURL_indexes": list(pageURL_indexes), "pageID_indexes": list(pageID_indexes)}
+    ).all()
+    return {row.pageURL_bidx for row in rows}, {row.pageID_bidx for row in rows}
 
-        # existing_pageID = db.query(SocialMediaInfo).filter(decrypt(SocialMediaInfo.pageID) == social_media_model.pageID).first()
-        # if existing_pageID:
-        #     raise HTTPException(status_code=400, detail=f"Page ID '{social_media_model.pageID}' already exists.")
+def page_indexes(input: Create) -> Dict[str, Tuple[str, str]]:
+    # platform name -> (pageURL, pageID) blind indexes; computed once per record and passed along
+    return {
+        platform_name: (blind_index(social_media_model.pageURL), blind_index(social_media_model.pageID))
+        for platform_name, social_media_model in input.platform_inputs.items()
+    }
 
-        platform_ids = find_platform(input.platform_inputs, db) 
-        social_media_objects = [] 
-        platform_to_info_map = {}
+def find_page_conflict(platform_inputs: Dict[str, SocialMediaModel], indexes: Dict[str, Tuple[str, str]],
+                       existing_pageURLs: Set[str], existing_pageIDs: Set[str]) -> Optional[str]:
+    # Returns the error message for the first page URL/ID that is taken or repeated, None otherwise
+    seen_pageURLs, seen_pageIDs = set(), set()
+    for platform_name, social_media_model in platform_inputs.items():
+        pageURL_bidx, pageID_bidx = indexes[platform_name]
+        if pageURL_bidx in existing_pageURLs or pageURL_bidx in seen_pageURLs:
+            return f"Page URL '{social_media_model.pageURL}' already exists."
+        if pageID_bidx in existing_pageIDs or pageID_bidx in seen_pageIDs:
+            return f"Page ID '{social_media_model.pageID}' already exists."
+        seen_pageURLs.add(pageURL_bidx)
+        seen_pageIDs.add(pageID_bidx)
+    return None
 
+def find_socialmediainfo_by_page(db: Session, pageURL: Optional[str] = None, pageID: Optional[str] = None) -> Optional[SocialMediaInfo]:
+    if pageURL is None and pageID is None:
+        raise ValueError("Either pageURL or pageID is required.")
+    if pageID is None:
+        return db.execute(statements.social_media_by_pageURL, {"pageURL_bidx": blind_index(pageURL)}).scalar_one_or_none()
+    if pageURL is None:
+        return db.execute(statements.social_media_by_pageID, {"pageID_bidx": blind_index(pageID)}).scalar_one_or_none()
+    return db.execute(
+        statements.social_media_by_page, {"pageURL_bidx": blind_index(pageURL), "pageID_bidx": blind_index(pageID)}
+    ).scalar_one_or_none()
+
+def create_socialmediainfo(input: Create, db: Session, hotel_info: HotelInfo) -> dict: 
+    indexes = page_indexes(input)
+    existing_pageURLs, existing_pageIDs = find_existing_pages(
+        {pageURL_bidx for pageURL_bidx, _ in indexes.values()},
+        {pageID_bidx for _, pageID_bidx in indexes.values()},
+        db
+    )
+    conflict = find_page_conflict(input.platform_inputs, indexes, existing_pageURLs, existing_pageIDs)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
+
+    platform_ids = find_platform(input.platform_inputs) 
+    encrypted_pages = encrypt_pages(list(input.platform_inputs.values()))
+    social_media_objects = [] 
+    platform_to_info_map = {}
+    for (platform_name, social_media_model), (pageURL, pageID) in zip(input.platform_inputs.items(), encrypted_pages):
         if platform_name not in platform_ids:
             raise HTTPException(status_code=400, detail=f"Platform {platform_name} not found in PlatformInfo.")
         
@@ -122,8 +253,10 @@ def create_socialmediainfo(input: Create, db: Session, hotel_info: HotelInfo) ->
             sma_person=social_media_model.sma_person,
             sma_email=social_media_model.sma_email,
             sma_phone=social_media_model.sma_phone,
-            pageURL=encrypt(social_media_model.pageURL),
-            pageID=encrypt(social_media_model.pageID),
+            pageURL=pageURL,
+            pageID=pageID,
+            pageURL_bidx=indexes[platform_name][0],
+            pageID_bidx=indexes[platform_name][1],
             mi_fbm=social_media_model.mi_fbm,
             added_dcube=social_media_model.added_dcube,
             hid=hotel_info.hid,
@@ -135,9 +268,10 @@ def create_socialmediainfo(input: Create, db: Session, hotel_info: HotelInfo) ->
     try:
         db.add_all(social_media_objects)
         db.flush()
-        logger.info(f"Created SocialMediaInfo with sid: {social_media_info.sid}")
-    except Exception as e:
-        raise
+        logger.debug("Created %d SocialMediaInfo rows for hid: %s", len(social_media_objects), hotel_info.hid)
+    except IntegrityError as e:
+        # A concurrent writer took one of the pages after the blind index probe above
+        raise conflict_error(e, input) from e
     return platform_to_info_map
 
 def build_personal_info(personal_info: PersonalInfo) -> dict:
@@ -180,16 +314,17 @@ def build_agency_info(agency_info: AgencyInfo) -> dict:
     except Exception as e:
         raise
 
-def build_social_media_info_list(social_media_info_list: List[SocialMediaInfo], decrypted_info: Dict[int, dict], db: Session) -> dict:
+def build_social_media_info_list(social_media_info_list: List[SocialMediaInfo], decrypted_info: Dict[int, dict]) -> dict:
     result = {}
     for sm_info in social_media_info_list:
-        platform_info = db.query(PlatformInfo).filter(PlatformInfo.plid == sm_info.plid).first() 
-        if not platform_info:
+        platform_name = resolve_platform_name(sm_info.plid)
+        if not platform_name:
             raise ValueError(f"No PlatformInfo found for plid: {sm_info.plid}")
-        logger.info(f"Platfrom ID: {platform_info.platform_name} and Decrypted data: {decrypted_info.get(sm_info.plid)}")
+        # Per-row message: sampled, and never includes the decrypted values
+        logger.debug("Building social media info for sid %s (platform %s)", sm_info.sid, platform_name, extra={"sample_key": "social_media_row"})
         decrypted_data = decrypted_info.get(sm_info.plid)
-    try:
-            result[platform_info.platform_name] = {
+        try:
+            result[platform_name] = {
                 "sma_name": sm_info.sma_name,
                 "sma_person": sm_info.sma_person,
                 "sma_email": sm_info.sma_email,
@@ -199,16 +334,56 @@ def build_social_media_info_list(social_media_info_list: List[SocialMediaInfo],
                 "mi_fbm": sm_info.mi_fbm,
                 "added_dcube": sm_info.added_dcube
             }
-    except Exception as e:
-        raise 
+        except Exception as e:
+            raise 
     return result
 
+def dumps(data: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"))
+
+def build_document(input: Create) -> dict:
+    # Same shape as build_info, built from the validated input so no row has to be read back or decrypted.
+    # An agency row stores an omitted not_applicable as the column default, False, and so does the document.
+    return {
+        "Personal Info": build_personal_info(input),
+        "Hotel Info": build_hotel_info(input),
+        "Agency Info": build_agency_info(None) if input.not_applicable else {**build_agency_info(input), "not_applicable": False},
+        "Social Media Info": {
+            platform_name: {
+                "sma_name": model.sma_name,
+                "sma_person": model.sma_person,
+                "sma_email": model.sma_email,
+                "sma_phone": model.sma_phone,
+                "pageURL": model.pageURL,
+                "pageID": model.pageID,
+                "mi_fbm": model.mi_fbm,
+                "added_dcube": model.added_dcube
+            }
+            for platform_name, model in input.platform_inputs.items()
+        }
+    }
+
+def document_rows(inputs: List[Create]) -> List[dict]:
+    # Any path that changes a record has to rewrite its document in the same transaction
+    documents = encrypt_many([dumps(build_document(input)) for input in inputs])
+    return [{"eid": input.eid, "document": document} for input, document in zip(inputs, documents)]
+
+def get_info_document(eid: str, db: Session) -> Optional[str]:
+    # The response body as JSON text, or None when the record has no document (yet)
+    token = db.execute(statements.document_by_eid, {"eid": eid}).scalar_one_or_none()
+    return decrypt(token) if token is not None else None
+
 def post_info(input: Response, db: Session) -> dict:
     try:
         personal_info = create_personalinfo(input, db)
         hotel_info = create_hotelinfo(input, db, personal_info)
         agency_info = create_agencyinfo(input, db, hotel_info)
         social_media_info = create_socialmediainfo(input, db, hotel_info)
+        if RECORD_DOCUMENTS:
+            db.execute(insert(RecordDocument), document_rows([input]))
+        invalidate_info(input.eid, db)
         
         response_data =  {
             "pid": personal_info.pid,
@@ -218,43 +393,420 @@ def post_info(input: Response, db: Session) -> dict:
         }
     except Exception as e:
         raise
-    logger.info(f"Successfully posted info: {response_data}")
+    logger.info("Successfully posted info for pid %s", response_data["pid"])
     return response_data
 
-def get_info(eid: str, db: Session) -> dict:
-    personal_info = db.query(PersonalInfo).filter(PersonalInfo.eid == eid).first()
-    if not personal_info:
-        logger.error(f"PersonalInfo not found for eid {eid}")
-        raise HTTPException(status_code=404, detail="PersonalInfo not found.")
+def bulk_error(index: int, record: Any, status_code: int, detail: Any) -> dict:
+    return {
+        "index": index,
+        "eid": record.get("eid") if isinstance(record, dict) else None,
+        "status": "error",
+        "status_code": status_code,
+        "detail": detail
+    }
+
+def validate_bulk_records(records: List[Any]) -> Dict[int, Any]:
+    # Returns index -> Create for valid records, index -> error dict otherwise
+    return {
+        index: value if isinstance(value, Create) else bulk_error(index, records[index], *value)
+        for index, value in validate_many(records).items()
+    }
+
+def find_personal_conflicts(inputs: Dict[int, Create], db: Session) -> Dict[int, str]:
+    # One combined lookup for every unique PersonalInfo column in the batch, plus in-batch duplicates
+    emails = {input.personal_email for input in inputs.values()}
+    eids = {input.eid for input in inputs.values()}
+    phones = {input.personal_phone for input in inputs.values()}
+    existing_emails, existing_eids, existing_phones = set(), set(), set()
+    if inputs:
+        rows = db.execute(
+            PERSONAL_CONFLICTS, {"emails": list(emails), "eids": list(eids), "phones": list(phones)}
+        ).all()
+        for row in rows:
+            existing_emails.add(row.personal_email)
+            existing_eids.add(row.eid)
+            existing_phones.add(row.personal_phone)
+
+    conflicts = {}
+    seen_emails, seen_eids, seen_phones = set(), set(), set()
+    for index, input in inputs.items():
+        if input.personal_email in existing_emails:
+            conflicts[index] = f"Personal email '{input.personal_email}' already exists."
+        elif input.eid in existing_eids:
+            conflicts[index] = f"Employee ID '{input.eid}' already exists."
+        elif input.personal_phone in existing_phones:
+            conflicts[index] = f"Personal phone '{input.personal_phone}' already exists."
+        elif input.personal_email in seen_emails:
+            conflicts[index] = f"Personal email '{input.personal_email}' appears more than once in the batch."
+        elif input.eid in seen_eids:
+            conflicts[index] = f"Employee ID '{input.eid}' appears more than once in the batch."
+        elif input.personal_phone in seen_phones:
+            conflicts[index] = f"Personal phone '{input.personal_phone}' appears more than once in the batch."
+        seen_emails.add(input.personal_email)
+        seen_eids.add(input.eid)
+        seen_phones.add(input.personal_phone)
+    return conflicts
+
+def find_bulk_page_conflicts(inputs: Dict[int, Create], blind_indexes: Dict[int, Dict[str, Tuple[str, str]]], db: Session) -> Dict[int, str]:
+    # One blind index probe for every page URL/ID in the batch; later duplicates inside the batch also fail
+    pageURL_indexes = {pageURL_bidx for index in inputs for pageURL_bidx, _ in blind_indexes[index].values()}
+    pageID_indexes = {pageID_bidx for index in inputs for _, pageID_bidx in blind_indexes[index].values()}
+    taken_pageURLs, taken_pageIDs = find_existing_pages(pageURL_indexes, pageID_indexes, db)
+
+    conflicts = {}
+    for index, input in inputs.items():
+        conflict = find_page_conflict(input.platform_inputs, blind_indexes[index], taken_pageURLs, taken_pageIDs)
+        if conflict:
+            conflicts[index] = conflict
+            continue
+        for pageURL_bidx, pageID_bidx in blind_indexes[index].values():
+            taken_pageURLs.add(pageURL_bidx)
+            taken_pageIDs.add(pageID_bidx)
+    return conflicts
+
+def insert_bulk(inputs: Dict[int, Create], platform_ids: Dict[str, int], blind_indexes: Dict[int, Dict[str, Tuple[str, str]]],
+                db: Session) -> Dict[int, dict]:
+    # One multi-row INSERT ... RETURNING per table. Returned rows are matched back to their
+    # records through a unique column instead of relying on the backend preserving order.
+    indexes = list(inputs.keys())
+    pid_by_eid = dict(db.execute(
+        insert(PersonalInfo).returning(PersonalInfo.eid, PersonalInfo.pid),
+        [
+            {
+                "first_name": input.first_name,
+                "last_name": input.last_name,
+                "title": input.title,
+                "personal_email": input.personal_email,
+                "eid": input.eid,
+                "country_code": input.country_code,
+                "personal_phone": input.personal_phone
+            }
+            for input in inputs.values()
+        ]
+    ).all())
+    pid_by_index = {index: pid_by_eid[inputs[index].eid] for index in indexes}
+
+    hid_by_pid = dict(db.execute(
+        insert(HotelInfo).returning(HotelInfo.pid, HotelInfo.hid),
+        [
+            {
+                "hotel_name": input.hotel_name,
+                "marsha_code": input.marsha_code,
+                "managed_franchise": input.managed_franchise,
+                "country": input.country,
+                "state": input.state,
+                "city": input.city,
+                "zip_code": input.zip_code,
+                "pid": pid_by_index[index]
+            }
+            for index, input in inputs.items()
+        ]
+    ).all())
+    hid_by_index = {index: hid_by_pid[pid_by_index[index]] for index in indexes}
 
-    hotel_info = db.query(HotelInfo).filter(HotelInfo.pid == personal_info.pid).first()
+    agency_indexes = [index for index in indexes if not inputs[index].not_applicable]
+    aid_by_index = {}
+    if agency_indexes:
+        aid_by_hid = dict(db.execute(
+            insert(AgencyInfo).returning(AgencyInfo.hid, AgencyInfo.aid),
+            [
+                {
+                    "agency_name": inputs[index].agency_name,
+                    "primary_contact": inputs[index].primary_contact,
+                    "primary_email": inputs[index].primary_email,
+                    "primary_phone": inputs[index].primary_phone,
+                    "not_applicable": inputs[index].not_applicable,
+                    "hid": hid_by_index[index]
+                }
+                for index in agency_indexes
+            ]
+        ).all())
+        aid_by_index = {index: aid_by_hid[hid_by_index[index]] for index in agency_indexes}
+
+    encrypted_pages = iter(encrypt_pages([model for index in indexes for model in inputs[index].platform_inputs.values()]))
+    social_media_rows = []
+    for index in indexes:
+        for platform_name, social_media_model in inputs[index].platform_inputs.items():
+            pageURL, pageID = next(encrypted_pages)
+            social_media_rows.append({
+                "sma_name": social_media_model.sma_name,
+                "sma_person": social_media_model.sma_person,
+                "sma_email": social_media_model.sma_email,
+                "sma_phone": social_media_model.sma_phone,
+                "pageURL": pageURL,
+                "pageID": pageID,
+                "pageURL_bidx": blind_indexes[index][platform_name][0],
+                "pageID_bidx": blind_indexes[index][platform_name][1],
+                "mi_fbm": social_media_model.mi_fbm,
+                "added_dcube": social_media_model.added_dcube,
+                "hid": hid_by_index[index],
+                "plid": platform_ids[platform_name]
+            })
+    sid_by_key = {
+        (row.hid, row.plid): row.sid
+        for row in db.execute(
+            insert(SocialMediaInfo).returning(SocialMediaInfo.hid, SocialMediaInfo.plid, SocialMediaInfo.sid),
+            social_media_rows
+        )
+    }
+    if RECORD_DOCUMENTS:
+        db.execute(insert(RecordDocument), document_rows([inputs[index] for index in indexes]))
+
+    return {
+        index: {
+            "pid": pid_by_index[index],
+            "hid": hid_by_index[index],
+            "aid": aid_by_index.get(index),
+            "sid": [sid_by_key[(hid_by_index[index], platform_ids[platform_name])] for platform_name in inputs[index].platform_inputs]
+        }
+        for index in indexes
+    }
+
+def post_info_bulk(records: List[Any], db: Session) -> dict:
+    validated = validate_bulk_records(records)
+    results = {index: value for index, value in validated.items() if isinstance(value, dict)}
+    inputs = {index: value for index, value in validated.items() if isinstance(value, Create)}
+
+    for index, detail in find_personal_conflicts(inputs, db).items():
+        results[index] = bulk_error(index, records[index], 400, detail)
+        del inputs[index]
+    blind_indexes = {index: page_indexes(input) for index, input in inputs.items()}
+    for index, detail in find_bulk_page_conflicts(inputs, blind_indexes, db).items():
+        results[index] = bulk_error(index, records[index], 400, detail)
+        del inputs[index]
+
+    platform_ids = platform_registry_for({name for input in inputs.values() for name in input.platform_inputs}).by_name
+    for index in list(inputs):
+        missing_platforms = [name for name in inputs[index].platform_inputs if name not in platform_ids]
+        if missing_platforms:
+            results[index] = bulk_error(index, records[index], 400, f"None of the platforms {', '.join(missing_platforms)} were found in PlatformInfo.")
+            del inputs[index]
+
+    if inputs:
+        try:
+            with db.begin_nested():
+                inserted = insert_bulk(inputs, platform_ids, blind_indexes, db)
+        except IntegrityError as e:
+            # A concurrent writer took one of our unique values; retry row by row so only the offenders fail
+            logger.warning("Bulk insert conflicted, retrying %d records individually: %s", len(inputs), e.orig)
+            inserted = {}
+            for index, input in inputs.items():
+                try:
+                    with db.begin_nested():
+                        inserted[index] = post_info(input, db)
+                except HTTPException as e:
+                    results[index] = bulk_error(index, records[index], e.status_code, e.detail)
+                except IntegrityError as e:
+                    results[index] = bulk_error(index, records[index], 400, "Record conflicts with an existing record.")
+        for index, response_data in inserted.items():
+            invalidate_info(inputs[index].eid, db)
+            results[index] = {"index": index, "eid": inputs[index].eid, "status": "success", **response_data}
+
+    ordered_results = [results[index] for index in range(len(records))]
+    inserted_count = sum(1 for result in ordered_results if result["status"] == "success")
+    logger.info("Bulk insert finished: %d inserted, %d failed", inserted_count, len(records) - inserted_count)
+    return {
+        "inserted": inserted_count,
+        "failed": len(records) - inserted_count,
+        "results": ordered_results
+    }
+
+def build_info(personal_info: PersonalInfo, decrypted_info: Optional[Dict[int, dict]] = None) -> dict:
+    hotel_info = personal_info.hotel_info
     if not hotel_info:
-        logger.error(f"HotelInfo not found for hid {personal_info.pid}")
+        logger.warning("HotelInfo not found for pid %s", personal_info.pid)
         raise HTTPException(status_code=404, detail="HotelInfo not found.")
 
-    agency_info = db.query(AgencyInfo).filter(AgencyInfo.hid == hotel_info.hid).first()
+    agency_info = hotel_info.agency_info
 
-    social_media_info = db.query(SocialMediaInfo).filter(SocialMediaInfo.hid == hotel_info.hid).all()
+    social_media_info = hotel_info.social_media_info
     if not social_media_info:
-        logger.error(f"SocialMediaInfo not found for hid {hotel_info.hid}")
+        logger.warning("SocialMediaInfo not found for hid %s", hotel_info.hid)
         raise HTTPException(status_code=404, detail="SocialMediaInfo not found.")
     try:
-        decrypted_info = {
-            smi.plid: {
-                'pageURL': decrypt(smi.pageURL),
-                'pageID': decrypt(smi.pageID)
-            }
-            for smi in social_media_info
-        }
-        logger.info(f"Decrypted Info Map: {decrypted_info}")
+        if decrypted_info is None:
+            decrypted_info = decrypt_pages(social_media_info)
 
         response_data = {
             "Personal Info": build_personal_info(personal_info),
             "Hotel Info": build_hotel_info(hotel_info),
             "Agency Info": build_agency_info(agency_info), #  if agency_info else None
-            "Social Media Info": build_social_media_info_list(social_media_info, decrypted_info, db),
+            "Social Media Info": build_social_media_info_list(social_media_info, decrypted_info),
         }   
     except Exception as e:
         raise
-    logger.info(f"Info retrieved successfully for sid {eid}")
-    return response_data
\ No newline at end of file
+    return response_data
+
+def build_info_from_rows(rows: list, decrypted_info: Optional[Dict[int, dict]] = None) -> dict:
+    # Same response as build_info, from the flattened rows of statements.record_rows_by_eid(s)
+    first = rows[0]
+    if first.hid is None:
+        logger.warning("HotelInfo not found for pid %s", first.pid)
+        raise HTTPException(status_code=404, detail="HotelInfo not found.")
+    social_media_rows = [row for row in rows if row.sid is not None]
+    if not social_media_rows:
+        logger.warning("SocialMediaInfo not found for hid %s", first.hid)
+        raise HTTPException(status_code=404, detail="SocialMediaInfo not found.")
+    if decrypted_info is None:
+        decrypted_info = decrypt_pages(social_media_rows)
+    return {
+        "Personal Info": build_personal_info(first),
+        "Hotel Info": build_hotel_info(first),
+        "Agency Info": build_agency_info(first if first.aid is not None else None),
+        "Social Media Info": build_social_media_info_list(social_media_rows, decrypted_info),
+    }
+
+def get_archived_info(eid: str) -> dict:
+    # Records moved out of the hot tables by archive_records.py; the hot tables are always checked first
+    response_data = record_archive.get(eid) if record_archive is not None else None
+    if response_data is None:
+        logger.info("PersonalInfo not found for eid %s", eid)
+        raise HTTPException(status_code=404, detail="PersonalInfo not found.")
+    return response_data
+
+def get_info(eid: str, db: Session) -> dict:
+    if INFO_ROW_TUPLES:
+        rows = db.execute(statements.record_rows_by_eid, {"eid": eid}).all()
+        if not rows:
+            return get_archived_info(eid)
+        response_data = build_info_from_rows(rows)
+    else:
+        personal_info = db.execute(statements.record_graph_by_eid, {"eid": eid}).unique().scalar_one_or_none()
+        if not personal_info:
+            return get_archived_info(eid)
+        response_data = build_info(personal_info)
+    logger.debug("Info retrieved successfully for eid %s", eid, extra={"sample_key": "get_info"})
+    return response_data
+
+def get_info_cached(eid: str, db: Session) -> dict:
+    response_data = info_cache.get(eid)
+    if response_data is None:
+        response_data = get_info(eid, db)
+        info_cache.set(eid, response_data)
+    return response_data
+
+def get_info_many(eids: List[str], db: Session) -> dict:
+    records = {}
+    missing = []
+    for eid in dict.fromkeys(eids):
+        response_data = info_cache.get(eid)
+        if response_data is None:
+            missing.append(eid)
+        else:
+            records[eid] = response_data
+
+    not_found = []
+    if missing and INFO_ROW_TUPLES:
+        # Rows arrive ordered by pid; consecutive rows with the same pid form one record graph
+        groups: Dict[int, list] = {}
+        for row in db.execute(statements.record_rows_by_eids, {"eids": missing}):
+            groups.setdefault(row.pid, []).append(row)
+        complete = [rows for rows in groups.values() if rows[0].hid is not None and rows[0].sid is not None]
+        plaintexts = iter(decrypt_many([token for rows in complete for row in rows for token in (row.pageURL, row.pageID)]))
+        for rows in complete:
+            decrypted_info = {row.plid: {'pageURL': next(plaintexts), 'pageID': next(plaintexts)} for row in rows}
+            response_data = build_info_from_rows(rows, decrypted_info)
+            info_cache.set(rows[0].eid, response_data)
+            records[rows[0].eid] = response_data
+        not_found = [eid for eid in missing if eid not in records]
+    elif missing:
+        personal_infos = db.execute(statements.record_graphs_by_eids, {"eids": missing}).scalars().all()
+        # Complete graphs only; a record without hotel or social media rows would 404 on the single lookup too
+        complete = [
+            personal_info for personal_info in personal_infos
+            if personal_info.hotel_info and personal_info.hotel_info.social_media_info
+        ]
+        social_media_rows = [smi for personal_info in complete for smi in personal_info.hotel_info.social_media_info]
+        plaintexts = iter(decrypt_many([token for smi in social_media_rows for token in (smi.pageURL, smi.pageID)]))
+        for personal_info in complete:
+            decrypted_info = {
+                smi.plid: {'pageURL': next(plaintexts), 'pageID': next(plaintexts)}
+                for smi in personal_info.hotel_info.social_media_info
+            }
+            response_data = build_info(personal_info, decrypted_info)
+            info_cache.set(personal_info.eid, response_data)
+            records[personal_info.eid] = response_data
+        not_found = [eid for eid in missing if eid not in records]
+    if not_found and record_archive is not None:
+        for eid in not_found:
+            response_data = record_archive.get(eid)
+            if response_data is not None:
+                info_cache.set(eid, response_data)
+                records[eid] = response_data
+        not_found = [eid for eid in not_found if eid not in records]
+
+    logger.debug("Batch lookup returned %d records, %d not found", len(records), len(not_found))
+    return {
+        "records": {eid: records[eid] for eid in dict.fromkeys(eids) if eid in records},
+        "not_found": not_found
+    }
+
+def list_hotels(db: Session, cursor: Optional[int] = None, limit: int = 50, marsha_code: Optional[str] = None,
+                country: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None,
+                managed_franchise: Optional[str] = None, platform: Optional[str] = None) -> dict:
+    # Keyset pagination: "hid > cursor ORDER BY hid" costs the same on every page, unlike OFFSET
+    parameters = {"limit": limit + 1}
+    if cursor is not None:
+        parameters["cursor"] = cursor
+    filters = {"marsha_code": marsha_code, "country": country, "state": state, "city": city, "managed_franchise": managed_franchise}
+    filters = {name: value for name, value in filters.items() if value is not None}
+    parameters.update(filters)
+    if platform is not None:
+        plid = platform_registry_for([platform]).plid(platform)
+        if plid is None:
+            raise HTTPException(status_code=400, detail=f"Unknown platform '{platform}'.")
+        parameters["plid"] = plid
+
+    rows = db.execute(statements.hotels_page(tuple(filters), cursor is not None, platform is not None), parameters).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # Platform names of the whole page in one query over the (hid, plid) index
+    platforms_by_hid: Dict[int, List[str]] = {row.hid: [] for row in rows}
+    if rows:
+        for hid, plid in db.execute(statements.hotel_platforms, {"hids": list(platforms_by_hid)}):
+            platforms_by_hid[hid].append(resolve_platform_name(plid))
+
+    return {
+        "hotels": [{**row._asdict(), "platforms": platforms_by_hid[row.hid]} for row in rows],
+        "next_cursor": rows[-1].hid if has_more else None
+    }
+
+async def post_info_async(input: Create, db: AsyncSession) -> dict:
+    # The write path is shared with post_info; run_sync drives it over the async connection, so no thread blocks on I/O
+    return await db.run_sync(lambda session: post_info(input, session))
+
+async def post_info_bulk_async(records: List[Any], db: AsyncSession) -> dict:
+    return await db.run_sync(lambda session: post_info_bulk(records, session))
+
+async def get_info_async(eid: str, db: AsyncSession) -> dict:
+    if INFO_ROW_TUPLES:
+        rows = (await db.execute(statements.record_rows_by_eid, {"eid": eid})).all()
+        if not rows:
+            return get_archived_info(eid)
+        response_data = build_info_from_rows(rows)
+    else:
+        result = await db.execute(statements.record_graph_by_eid, {"eid": eid})
+        personal_info = result.unique().scalar_one_or_none()
+        if not personal_info:
+            return get_archived_info(eid)
+        # The graph is fully eager loaded, so building the response never triggers lazy I/O
+        response_data = build_info(personal_info)
+    logger.debug("Info retrieved successfully for eid %s", eid, extra={"sample_key": "get_info"})
+    return response_data
+
+async def get_info_cached_async(eid: str, db: AsyncSession) -> dict:
+    response_data = info_cache.get(eid)
+    if response_data is None:
+        response_data = await get_info_async(eid, db)
+        info_cache.set(eid, response_data)
+    return response_data
+
+async def get_info_many_async(eids: List[str], db: AsyncSession) -> dict:
+    return await db.run_sync(lambda session: get_info_many(eids, session))
+
+async def list_hotels_async(db: AsyncSession, **filters) -> dict:
+    return await db.run_sync(lambda session: list_hotels(session, **filters))
+
+async def get_info_document_async(eid: str, db: AsyncSession) -> Optional[str]:
+    token = (await db.execute(statements.document_by_eid, {"eid": eid})).scalar_one_or_none()
+    return decrypt(token) if token is not None else None
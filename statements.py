@@ -0,0 +1,118 @@
+from functools import lru_cache
+from typing import Tuple
+from sqlalchemy import bindparam, exists, or_, select, union_all
+from sqlalchemy.orm import joinedload, selectinload
+from models import PersonalInfo, HotelInfo, AgencyInfo, SocialMediaInfo, PlatformInfo, RecordDocument, ArchivedRecord, ArchivedPage
+
+# Hot-path statements, built once at import. Values are supplied as bound parameters at execution
+# (db.execute(statement, {"eid": eid})), so a statement is never rebuilt per call: its cache key is
+# computed once, every execution hits SQLAlchemy's compiled cache, and the SQL text stays identical
+# for the driver's prepared statement cache. Lists go through expanding parameters.
+
+# Loader options that fetch a PersonalInfo with its hotel, agency and social media rows in one joined query
+_hotel_joined = joinedload(PersonalInfo.hotel_info)
+RECORD_GRAPH_OPTIONS = (
+    _hotel_joined.joinedload(HotelInfo.agency_info),
+    _hotel_joined.joinedload(HotelInfo.social_media_info),
+)
+# Loader options for many PersonalInfo rows at once: one IN query per table, however many eids are requested
+_hotel_selectin = selectinload(PersonalInfo.hotel_info)
+RECORD_GRAPH_BATCH_OPTIONS = (
+    _hotel_selectin.selectinload(HotelInfo.agency_info),
+    _hotel_selectin.selectinload(HotelInfo.social_media_info),
+)
+
+# ORM identities, for callers that walk relationships or modify what they load
+record_graph_by_eid = select(PersonalInfo).options(*RECORD_GRAPH_OPTIONS).where(PersonalInfo.eid == bindparam("eid"))
+record_graphs_by_eids = (
+    select(PersonalInfo).options(*RECORD_GRAPH_BATCH_OPTIONS).where(PersonalInfo.eid.in_(bindparam("eids", expanding=True)))
+)
+social_media_by_pageURL = select(SocialMediaInfo).where(SocialMediaInfo.pageURL_bidx == bindparam("pageURL_bidx")).limit(1)
+social_media_by_pageID = select(SocialMediaInfo).where(SocialMediaInfo.pageID_bidx == bindparam("pageID_bidx")).limit(1)
+social_media_by_page = (
+    select(SocialMediaInfo)
+    .where(SocialMediaInfo.pageURL_bidx == bindparam("pageURL_bidx"), SocialMediaInfo.pageID_bidx == bindparam("pageID_bidx"))
+    .limit(1)
+)
+
+# Plain row tuples: no identity map, no relationship loading, nothing to flush
+document_by_eid = select(RecordDocument.document).where(RecordDocument.eid == bindparam("eid"))
+_emails, _eids, _phones = (bindparam(name, expanding=True) for name in ("emails", "eids", "phones"))
+personal_conflicts = select(PersonalInfo.personal_email, PersonalInfo.eid, PersonalInfo.personal_phone).where(or_(
+    PersonalInfo.personal_email.in_(_emails), PersonalInfo.eid.in_(_eids), PersonalInfo.personal_phone.in_(_phones),
+))
+_pageURL_indexes, _pageID_indexes = (bindparam(name, expanding=True) for name in ("pageURL_indexes", "pageID_indexes"))
+existing_pages = select(SocialMediaInfo.pageURL_bidx, SocialMediaInfo.pageID_bidx).where(or_(
+    SocialMediaInfo.pageURL_bidx.in_(_pageURL_indexes), SocialMediaInfo.pageID_bidx.in_(_pageID_indexes),
+))
+# The same probes extended to archive tombstones, still one round trip; used while ARCHIVE_PATH is set
+personal_or_archived_conflicts = union_all(
+    personal_conflicts,
+    select(ArchivedRecord.personal_email, ArchivedRecord.eid, ArchivedRecord.personal_phone).where(or_(
+        ArchivedRecord.personal_email.in_(_emails), ArchivedRecord.eid.in_(_eids), ArchivedRecord.personal_phone.in_(_phones),
+    )),
+)
+existing_or_archived_pages = union_all(
+    existing_pages,
+    select(ArchivedPage.pageURL_bidx, ArchivedPage.pageID_bidx).where(or_(
+        ArchivedPage.pageURL_bidx.in_(_pageURL_indexes), ArchivedPage.pageID_bidx.in_(_pageID_indexes),
+    )),
+)
+platforms = select(PlatformInfo.platform_name, PlatformInfo.plid)
+hotel_platforms = (
+    select(SocialMediaInfo.hid, SocialMediaInfo.plid)
+    .where(SocialMediaInfo.hid.in_(bindparam("hids", expanding=True)))
+    .order_by(SocialMediaInfo.hid, SocialMediaInfo.sid)
+)
+
+# A record graph flattened to one row per social media entry. Column names are unique across the four
+# tables, so a row can be handed to the services build_* helpers in place of each ORM object.
+record_rows = (
+    select(
+        PersonalInfo.pid, PersonalInfo.first_name, PersonalInfo.last_name, PersonalInfo.title,
+        PersonalInfo.personal_email, PersonalInfo.eid, PersonalInfo.country_code, PersonalInfo.personal_phone,
+        HotelInfo.hid, HotelInfo.hotel_name, HotelInfo.marsha_code, HotelInfo.managed_franchise,
+        HotelInfo.country, HotelInfo.state, HotelInfo.city, HotelInfo.zip_code,
+        AgencyInfo.aid, AgencyInfo.agency_name, AgencyInfo.primary_contact, AgencyInfo.primary_email,
+        AgencyInfo.primary_phone, AgencyInfo.not_applicable,
+        SocialMediaInfo.sid, SocialMediaInfo.plid, SocialMediaInfo.sma_name, SocialMediaInfo.sma_person,
+        SocialMediaInfo.sma_email, SocialMediaInfo.sma_phone, SocialMediaInfo.pageURL, SocialMediaInfo.pageID,
+        SocialMediaInfo.mi_fbm, SocialMediaInfo.added_dcube
+    )
+    .outerjoin(HotelInfo, HotelInfo.pid == PersonalInfo.pid)
+    .outerjoin(AgencyInfo, AgencyInfo.hid == HotelInfo.hid)
+    .outerjoin(SocialMediaInfo, SocialMediaInfo.hid == HotelInfo.hid)
+)
+record_rows_by_eid = record_rows.where(PersonalInfo.eid == bindparam("eid")).order_by(SocialMediaInfo.sid)
+record_rows_by_eids = (
+    record_rows.where(PersonalInfo.eid.in_(bindparam("eids", expanding=True))).order_by(PersonalInfo.pid, SocialMediaInfo.sid)
+)
+
+HOTEL_FILTER_COLUMNS = {
+    "marsha_code": HotelInfo.marsha_code,
+    "country": HotelInfo.country,
+    "state": HotelInfo.state,
+    "city": HotelInfo.city,
+    "managed_franchise": HotelInfo.managed_franchise,
+}
+
+@lru_cache(maxsize=None)
+def hotels_page(filters: Tuple[str, ...], after_cursor: bool, by_platform: bool):
+    # GET /hotels has one statement per combination of filters in use (at most 2^7), each built once.
+    # Parameters: limit, plus cursor, plid and one per name in filters when used.
+    statement = (
+        select(
+            HotelInfo.hid, PersonalInfo.eid, HotelInfo.hotel_name, HotelInfo.marsha_code, HotelInfo.managed_franchise,
+            HotelInfo.country, HotelInfo.state, HotelInfo.city, HotelInfo.zip_code
+        )
+        .join(PersonalInfo, PersonalInfo.pid == HotelInfo.pid)
+        .order_by(HotelInfo.hid)
+        .limit(bindparam("limit"))
+    )
+    if after_cursor:
+        statement = statement.where(HotelInfo.hid > bindparam("cursor"))
+    for name in filters:
+        statement = statement.where(HOTEL_FILTER_COLUMNS[name] == bindparam(name))
+    if by_platform:
+        statement = statement.where(exists().where(SocialMediaInfo.hid == HotelInfo.hid, SocialMediaInfo.plid == bindparam("plid")))
+    return statement
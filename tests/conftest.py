@@ -0,0 +1,54 @@
+import os, sys, tempfile
+import pytest
+
+# config.py reads the environment at import, so the test settings are in place before any application module loads.
+# Every run gets its own SQLite file and the read-through cache is off, so counts reflect the database path.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="data_collection_tests_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIRECTORY, 'test.db')}",
+    "SQLALCHEMY_POOL_SIZE": "5",
+    "SQLALCHEMY_MAX_OVERFLOW": "5",
+    "AES_KEY": "ab" * 32,
+    "HOST": "127.0.0.1",
+    "PORT": "8000",
+    "LOG_LEVEL": "WARNING",
+    "DB_MODE": "sync",
+    "INGEST_MODE": "sync",
+    "INFO_CACHE_BACKEND": "none",
+})
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    # Entering the client runs the lifespan hook, which creates the tables and loads the platform registry
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def seeded(client):
+    # Records 1-60 from the benchmark generator, inserted through the bulk path
+    from benchmarks.datagen import generate_records
+    from database import SessionLocal
+    from services import post_info_bulk
+    with SessionLocal() as db:
+        result = post_info_bulk(list(generate_records(60)), db)
+        db.commit()
+    assert result["inserted"] == 60
+    return 60
+
+@pytest.fixture
+def statements():
+    # SQL text of every statement the sync engine executes while the test runs
+    from sqlalchemy import event
+    from database import engine
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,83 @@
+import os
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+import AES
+
+
+def legacy_cbc(plaintext: str) -> bytes:
+    # Headerless CBC as written before GCM: IV + PKCS#7 padded ciphertext under key id 0
+    data = plaintext.encode("utf-8")
+    padding_size = AES.BLOCK_SIZE - len(data) % AES.BLOCK_SIZE
+    iv = os.urandom(AES.BLOCK_SIZE)
+    encryptor = Cipher(algorithms.AES(AES.KEYS[0]), modes.CBC(iv)).encryptor()
+    return iv + encryptor.update(data + bytes([padding_size]) * padding_size) + encryptor.finalize()
+
+
+def test_round_trip():
+    assert AES.decrypt(AES.encrypt("https://example.com/page")) == "https://example.com/page"
+
+
+def test_tampered_gcm_tokens_are_rejected():
+    token = AES.encrypt("https://example.com/page")
+    for position in range(2, len(token)):
+        for flip in (0x01, 0x80):
+            tampered = bytearray(token)
+            tampered[position] ^= flip
+            with pytest.raises(ValueError):
+                AES.decrypt(bytes(tampered))
+
+
+def test_tampered_unkeyed_gcm_tokens_are_rejected():
+    token = AES.HEADER_GCM + AES.encrypt("value")[2:]
+    assert AES.decrypt(token) == "value"
+    for position in range(1, len(token)):
+        tampered = bytearray(token)
+        tampered[position] ^= 0x01
+        with pytest.raises(ValueError):
+            AES.decrypt(bytes(tampered))
+
+
+def test_headerless_cbc_is_rejected_until_marked():
+    token = legacy_cbc("legacy value")
+    with pytest.raises(ValueError):
+        AES.decrypt(AES.HEADER_GCM + token[1:])
+    marked = AES.classify_legacy(token)
+    assert marked == AES.HEADER_CBC + token
+    assert AES.decrypt(marked) == "legacy value"
+    assert AES.decrypt(marked.hex()) == "legacy value"
+
+
+def test_classify_legacy_is_idempotent_and_keeps_gcm():
+    token = AES.encrypt("value")
+    assert AES.classify_legacy(token) == token
+    assert AES.classify_legacy(token.hex()) == token
+    marked = AES.classify_legacy(legacy_cbc("value"))
+    assert AES.classify_legacy(marked) == marked
+
+
+def test_classify_legacy_marks_cbc_that_looks_like_gcm():
+    # A CBC IV can start with a GCM version byte; the tag decides
+    for header in (AES.HEADER_GCM, AES.HEADER_GCM_KEYED + bytes([AES.ACTIVE_KEY_ID])):
+        token = legacy_cbc("a legacy value longer than one block")
+        token = header + token[len(header):]
+        assert AES.classify_legacy(token)[:1] == AES.HEADER_CBC
+
+
+def test_unknown_key_id_is_rejected():
+    token = bytearray(AES.encrypt("value"))
+    token[1] = 0xFF
+    with pytest.raises(ValueError):
+        AES.decrypt(bytes(token))
+
+
+def test_keyring_rejects_a_repeated_key_id():
+    with pytest.raises(ValueError, match="AES KEYS lists key id 3 more than once."):
+        AES._parse_keyring(None, f"3:{'11' * 32},3:{'22' * 32}")
+    with pytest.raises(ValueError, match="AES KEYS lists key id 3 more than once."):
+        AES._parse_keyring(None, f"3:{'11' * 32},3:{'11' * 32}")
+
+
+def test_keyring_entry_zero_has_to_match_aes_key():
+    assert AES._parse_keyring("11" * 32, f"0:{'11' * 32},1:{'22' * 32}") == {0: b"\x11" * 32, 1: b"\x22" * 32}
+    with pytest.raises(ValueError, match="AES KEYS entry 0 must match AES KEY."):
+        AES._parse_keyring("11" * 32, f"0:{'22' * 32}")
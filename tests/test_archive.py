@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import delete, select
+from benchmarks.datagen import generate_records
+from database import SessionLocal
+from models import PersonalInfo, ArchivedRecord, ArchivedPage
+import services
+import statements
+from archive import RecordArchive
+from archive_records import archive_eids, rebuild_tombstones
+
+
+def record(number: int) -> dict:
+    return next(generate_records(1, start=number))
+
+
+@pytest.fixture
+def archive_path(client, tmp_path, monkeypatch):
+    # services picks the archive and the tombstone-aware probes at import, from ARCHIVE_PATH
+    path = str(tmp_path / "archive")
+    record_archive = RecordArchive(path)
+    monkeypatch.setattr(services, "record_archive", record_archive)
+    monkeypatch.setattr(services, "PERSONAL_CONFLICTS", statements.personal_or_archived_conflicts)
+    monkeypatch.setattr(services, "EXISTING_PAGES", statements.existing_or_archived_pages)
+    yield path
+    record_archive.close()
+
+
+def post_and_archive(client, path: str, numbers) -> list:
+    posted = [record(number) for number in numbers]
+    for each in posted:
+        assert client.post("/info_input", json=each).status_code == 201
+    assert archive_eids(path, [each["eid"] for each in posted]) == len(posted)
+    return posted
+
+
+def test_archived_records_are_read_back(client, seeded, archive_path):
+    posted = [record(8001), record(8002)]
+    for each in posted:
+        assert client.post("/info_input", json=each).status_code == 201
+    live = [client.get(f"/info_output/{each['eid']}").json() for each in posted]
+
+    assert archive_eids(archive_path, [each["eid"] for each in posted]) == 2
+    with SessionLocal() as db:
+        assert db.execute(select(PersonalInfo).where(PersonalInfo.eid == posted[0]["eid"])).first() is None
+
+    for each, response_data in zip(posted, live):
+        response = client.get(f"/info_output/{each['eid']}")
+        assert response.status_code == 200
+        assert response.json() == response_data
+
+    # A hot record, both archived ones and an unknown eid in one batch
+    response = client.get("/info_output", params={"eids": ["EID00000001", posted[0]["eid"], posted[1]["eid"], "EID-MISSING"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["records"][posted[0]["eid"]] == live[0]
+    assert body["records"][posted[1]["eid"]] == live[1]
+    assert body["not_found"] == ["EID-MISSING"]
+
+
+def test_archived_unique_values_stay_taken(client, archive_path):
+    archived, = post_and_archive(client, archive_path, [8101])
+    platform_name, page = next(iter(archived["platform_inputs"].items()))
+
+    duplicates = {
+        f"Employee ID '{archived['eid']}' already exists.": {"eid": archived["eid"]},
+        f"Personal email '{archived['personal_email']}' already exists.": {"personal_email": archived["personal_email"]},
+        f"Personal phone '{archived['personal_phone']}' already exists.": {"personal_phone": archived["personal_phone"]},
+    }
+    for message, changes in duplicates.items():
+        duplicate = record(8102)
+        duplicate.update(changes)
+        response = client.post("/info_input", json=duplicate)
+        assert response.status_code == 400
+        assert response.json()["detail"] == message
+
+    duplicate = record(8102)
+    duplicate["platform_inputs"] = {platform_name: dict(page, pageID="fresh-page-id")}
+    response = client.post("/info_input", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Page URL '{page['pageURL']}' already exists."
+
+    # The whole record again, through the bulk path
+    with SessionLocal() as db:
+        result = services.post_info_bulk([archived], db)
+        db.rollback()
+    assert result["inserted"] == 0
+    assert result["results"][0]["status_code"] == 400
+    assert result["results"][0]["detail"] == f"Personal email '{archived['personal_email']}' already exists."
+
+
+def test_tombstones_are_rebuilt_from_the_segments(client, archive_path):
+    archived = post_and_archive(client, archive_path, [8201, 8202])
+    eids = [each["eid"] for each in archived]
+    pages = sum(len(each["platform_inputs"]) for each in archived)
+
+    with SessionLocal() as db:
+        db.execute(delete(ArchivedPage))
+        db.execute(delete(ArchivedRecord))
+        db.commit()
+
+    assert rebuild_tombstones(archive_path) == 2
+    with SessionLocal() as db:
+        records = db.execute(select(ArchivedRecord)).scalars().all()
+        assert sorted(archived_record.eid for archived_record in records) == eids
+        assert {archived_record.personal_email for archived_record in records} == {each["personal_email"] for each in archived}
+        assert db.query(ArchivedPage).count() == pages
+
+    response = client.post("/info_input", json=record(8203) | {"personal_phone": archived[1]["personal_phone"]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Personal phone '{archived[1]['personal_phone']}' already exists."
@@ -0,0 +1,98 @@
+import os, stat
+import pytest
+from benchmarks.datagen import generate_records
+from database import SessionLocal
+import cache
+import services
+from cache import LRUCache, SQLiteCache
+
+
+class Clock:
+    # Stands in for the time module inside cache.py
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path, clock):
+    if request.param == "memory":
+        return LRUCache(max_size=3, ttl=60)
+    return SQLiteCache(str(tmp_path / "info_cache.sqlite3"), max_size=3, ttl=60, access_resolution=0)
+
+
+def test_entries_expire_after_the_ttl(backend, clock):
+    backend.set("a", {"value": 1})
+    clock.now += 59
+    assert backend.get("a") == {"value": 1}
+    clock.now += 2
+    assert backend.get("a") is None
+    assert len(backend) == 0
+    assert backend.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 0, "expirations": 1}
+
+
+def test_least_recently_used_entry_is_evicted(backend, clock):
+    for key in "abc":
+        backend.set(key, key)
+        clock.now += 1
+    assert backend.get("a") == "a"
+    clock.now += 1
+    backend.set("d", "d")
+    assert backend.get("b") is None
+    assert [backend.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert backend.stats() == {"size": 3, "hits": 4, "misses": 1, "evictions": 1, "expirations": 0}
+
+
+def test_delete_and_clear(backend):
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.delete("a")
+    assert backend.get("a") is None and backend.get("b") == 2
+    backend.clear()
+    assert len(backend) == 0
+
+
+def test_sqlite_cache_is_shared_and_private(tmp_path, clock):
+    path = str(tmp_path / "info_cache.sqlite3")
+    SQLiteCache(path, max_size=10, ttl=60).set("a", {"Personal Info": {"eid": "a"}})
+    # A second worker opening the same file sees the entry
+    assert SQLiteCache(path, max_size=10, ttl=60).get("a") == {"Personal Info": {"eid": "a"}}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_sqlite_cache_evicts_in_batches(tmp_path, clock):
+    backend = SQLiteCache(str(tmp_path / "info_cache.sqlite3"), max_size=200, ttl=1000)
+    assert backend.evict_every == 2
+    for number in range(201):
+        backend.set(str(number), number)
+        clock.now += 1
+    assert len(backend) == 201
+    backend.set("201", 201)
+    assert len(backend) == 200
+    assert backend.evictions == 2
+    assert backend.get("0") is None and backend.get("1") is None and backend.get("2") == 2
+
+
+def test_write_invalidates_a_cached_record(client, monkeypatch):
+    monkeypatch.setattr(services, "info_cache", LRUCache(max_size=10, ttl=60))
+    posted = next(generate_records(1, start=9001))
+    services.info_cache.set(posted["eid"], {"stale": True})
+
+    assert client.post("/info_input", json=posted).status_code == 201
+    assert services.info_cache.get(posted["eid"]) is None
+    with SessionLocal() as db:
+        response_data = services.get_info_cached(posted["eid"], db)
+    assert response_data["Personal Info"]["eid"] == posted["eid"]
+    assert services.info_cache.get(posted["eid"]) is response_data
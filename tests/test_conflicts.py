@@ -0,0 +1,29 @@
+from benchmarks.datagen import generate_records
+
+
+def record(number: int) -> dict:
+    return next(generate_records(1, start=number))
+
+
+def test_duplicate_reports_columns_in_precheck_order(client):
+    original = record(5001)
+    assert client.post("/info_input", json=original).status_code == 201
+
+    # Exact duplicate: email, eid and phone all collide, email is reported
+    response = client.post("/info_input", json=original)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Personal email '{original['personal_email']}' already exists."
+
+    # eid and phone collide, eid is reported
+    duplicate = record(5002)
+    duplicate.update(eid=original["eid"], personal_phone=original["personal_phone"])
+    response = client.post("/info_input", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Employee ID '{original['eid']}' already exists."
+
+    # Only the phone collides
+    duplicate = record(5003)
+    duplicate.update(personal_phone=original["personal_phone"])
+    response = client.post("/info_input", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Personal phone '{original['personal_phone']}' already exists."
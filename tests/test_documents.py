@@ -0,0 +1,41 @@
+import json
+import pytest
+from benchmarks.datagen import generate_records
+from database import SessionLocal
+from schema import Create
+from services import build_document, dumps, get_info, post_info_bulk
+
+AGENCY = {"agency_name": "Agency", "primary_contact": "Liam", "primary_email": "agency@agency.com", "primary_phone": "5557654321"}
+
+
+def record(number: int, not_applicable) -> dict:
+    record = next(generate_records(1, start=number))
+    record.pop("not_applicable")
+    if not_applicable is not ...:
+        record["not_applicable"] = not_applicable
+    if not_applicable is not True:
+        record.update(AGENCY)
+    return record
+
+
+def document(record: dict) -> dict:
+    # As stored in record_document and served by /info_output/{eid}
+    return json.loads(dumps(build_document(Create.model_validate(record))))
+
+
+# ... leaves not_applicable out of the payload
+@pytest.mark.parametrize("number,not_applicable", [(7001, ...), (7002, False), (7003, True), (7004, None)])
+def test_document_matches_live_response(client, number, not_applicable):
+    posted = record(number, not_applicable)
+    assert client.post("/info_input", json=posted).status_code == 201
+    with SessionLocal() as db:
+        assert document(posted) == get_info(posted["eid"], db)
+
+
+def test_bulk_document_matches_live_response(client):
+    posted = [record(7101, ...), record(7102, False), record(7103, True)]
+    with SessionLocal() as db:
+        assert post_info_bulk(posted, db)["inserted"] == 3
+        db.commit()
+        for each in posted:
+            assert document(each) == get_info(each["eid"], db)
@@ -0,0 +1,19 @@
+import json
+from admission import admission
+
+
+def test_export_streams_every_record_and_releases_its_slot(client, seeded):
+    response = client.get("/export")
+    assert response.status_code == 200
+    eids = [json.loads(line)["Personal Info"]["eid"] for line in response.text.splitlines()]
+    assert len(eids) >= seeded
+    assert admission.in_flight == 0
+
+
+def test_export_waits_for_admission(client, monkeypatch):
+    # Every slot taken: the export queues behind them and gets a 503 once the queue timeout passes
+    monkeypatch.setattr(admission, "in_flight", admission.limit)
+    monkeypatch.setattr(admission, "queue_timeout", 0.05)
+    response = client.get("/export")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.retry_after)
@@ -0,0 +1,38 @@
+from benchmarks.datagen import generate_records
+from schema import Create
+from ingest import IngestQueue
+
+
+def record(number: int, **changes) -> Create:
+    return Create.model_validate(next(generate_records(1, start=number)) | changes)
+
+
+def flush(*inputs: Create) -> list:
+    # Submits and flushes one batch without the background thread
+    ingest_queue = IngestQueue(max_size=10, batch_size=10, flush_interval=0.01, ticket_ttl=60)
+    tickets = [ingest_queue.submit(input)["ticket"] for input in inputs]
+    ingest_queue._flush(ingest_queue._next_batch())
+    return [ingest_queue.status(ticket) for ticket in tickets]
+
+
+def test_duplicates_in_one_batch_get_the_single_insert_message(client):
+    first = record(9101)
+    same_eid = record(9102, eid=first.eid)
+    same_page = record(9103, platform_inputs={name: page.model_dump() for name, page in first.platform_inputs.items()})
+    outcomes = flush(first, same_eid, same_page)
+
+    assert outcomes[0]["status"] == "success"
+    assert (outcomes[1]["status_code"], outcomes[1]["detail"]) == (400, f"Employee ID '{first.eid}' already exists.")
+    page = next(iter(first.platform_inputs.values()))
+    assert (outcomes[2]["status_code"], outcomes[2]["detail"]) == (400, f"Page URL '{page.pageURL}' already exists.")
+
+
+def test_duplicate_of_a_rejected_submission_is_inserted(client):
+    taken = next(generate_records(1, start=9111))
+    assert client.post("/info_input", json=taken).status_code == 201
+    rejected = record(9112, personal_phone=taken["personal_phone"])
+    same_eid = record(9113, eid=rejected.eid)
+    outcomes = flush(rejected, same_eid)
+
+    assert outcomes[0]["detail"] == f"Personal phone '{taken['personal_phone']}' already exists."
+    assert outcomes[1]["status"] == "success"
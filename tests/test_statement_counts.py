@@ -0,0 +1,28 @@
+import pytest
+from benchmarks.datagen import eid_for
+from database import SessionLocal
+from services import get_info, get_info_many
+
+# Round trips per read must not depend on how many rows a record or page has, nor on how many eids are asked for
+
+def test_get_info_is_one_statement(seeded, statements):
+    with SessionLocal() as db:
+        response_data = get_info(eid_for(1), db)
+    assert response_data["Personal Info"]["eid"] == eid_for(1)
+    assert len(statements) == 1
+
+@pytest.mark.parametrize("count", [1, 10, 50])
+def test_get_info_many_is_constant(seeded, statements, count):
+    with SessionLocal() as db:
+        result = get_info_many([eid_for(number) for number in range(1, count + 1)], db)
+    assert len(result["records"]) == count
+    # One query for personal_info plus one selectin query each for hotel, agency and social media rows
+    assert len(statements) == 4
+
+@pytest.mark.parametrize("limit", [1, 10, 50])
+def test_hotels_page_is_constant(client, seeded, statements, limit):
+    response = client.get("/hotels", params={"limit": limit})
+    assert response.status_code == 200
+    assert len(response.json()["hotels"]) == limit
+    # The page itself and the platforms of every hotel on it
+    assert len(statements) == 2
@@ -0,0 +1,178 @@
+import copy
+import pytest
+from fastapi import HTTPException
+from schema import Create, validate_many
+
+# A record the rules accept; each test breaks one part of a copy
+VALID = {
+    "first_name": "Ava",
+    "last_name": "Smith",
+    "title": "General Manager",
+    "personal_email": "ava@hotel.com",
+    "eid": "EID-VALIDATION",
+    "country_code": "+1",
+    "personal_phone": "5551234567",
+    "hotel_name": "Hotel One",
+    "marsha_code": "M0000001",
+    "managed_franchise": "Managed",
+    "country": "USA",
+    "state": "Texas",
+    "city": "Austin",
+    "zip_code": 73301,
+    "agency_name": "Agency",
+    "primary_contact": "Liam",
+    "primary_email": "agency@agency.com",
+    "primary_phone": "5557654321",
+    "not_applicable": False,
+    "platform_inputs": {
+        "Facebook": {
+            "sma_name": "Agency",
+            "sma_person": "Mia",
+            "sma_email": "sma@agency.com",
+            "sma_phone": "5550001111",
+            "pageURL": "https://www.facebook.com/hotelone",
+            "pageID": "facebook-1",
+            "mi_fbm": False,
+            "added_dcube": True
+        }
+    }
+}
+
+PERSONAL_FIELDS = ["first_name", "last_name", "title", "personal_email", "eid", "country_code", "personal_phone"]
+HOTEL_FIELDS = ["hotel_name", "marsha_code", "managed_franchise", "country", "state", "city", "zip_code"]
+AGENCY_FIELDS = ["agency_name", "primary_contact", "primary_email", "primary_phone"]
+SOCIAL_MEDIA_FIELDS = ["sma_name", "sma_person", "sma_email", "sma_phone", "pageURL", "pageID"]
+
+
+def payload(**changes) -> dict:
+    record = copy.deepcopy(VALID)
+    record.update(changes)
+    return record
+
+
+def social_media(**changes) -> dict:
+    record = payload()
+    record["platform_inputs"]["Facebook"].update(changes)
+    return record
+
+
+def errors_of(record: dict) -> list:
+    with pytest.raises(HTTPException) as raised:
+        Create.model_validate(record)
+    assert raised.value.status_code == 422
+    return raised.value.detail
+
+
+def test_valid_payload():
+    assert Create.model_validate(payload()).eid == "EID-VALIDATION"
+
+
+# The messages below are the ones the baseline validators raised for a single faulty field
+@pytest.mark.parametrize("field,section", [
+    *[(field, "PersonalInfo") for field in PERSONAL_FIELDS],
+    *[(field, "HotelInfo") for field in HOTEL_FIELDS],
+    *[(field, "AgencyInfo") for field in AGENCY_FIELDS],
+])
+def test_missing_field_message(field, section):
+    record = payload()
+    del record[field]
+    assert errors_of(record) == [{"loc": [field], "msg": f"Missing '{field}' from '{section}'"}]
+
+
+@pytest.mark.parametrize("field", SOCIAL_MEDIA_FIELDS)
+def test_missing_social_media_field_message(field):
+    record = social_media(**{field: ""})
+    assert errors_of(record) == [
+        {"loc": ["platform_inputs", "Facebook", field], "msg": f"Missing '{field}' from 'SocialMediaInfo'"}
+    ]
+
+
+@pytest.mark.parametrize("field", ["personal_email", "primary_email"])
+def test_invalid_email_message(field):
+    assert errors_of(payload(**{field: "not-an-email"})) == [
+        {"loc": [field], "msg": "Invalid email structure for not-an-email. It should follow structure: user@example.com"}
+    ]
+
+
+@pytest.mark.parametrize("field", ["personal_phone", "primary_phone"])
+def test_invalid_phone_message(field):
+    assert errors_of(payload(**{field: "12345"})) == [
+        {"loc": [field], "msg": "Invalid phone number for 12345. It must be exactly 10 digits."}
+    ]
+
+
+@pytest.mark.parametrize("field,value,message", [
+    ("sma_email", "nope", "Invalid email structure for nope. It should follow structure: user@example.com"),
+    ("sma_phone", "555", "Invalid phone number for 555. It must be exactly 10 digits."),
+    ("pageURL", "http://facebook.com/x", "Invalid URL for http://facebook.com/x."),
+])
+def test_invalid_social_media_format_message(field, value, message):
+    assert errors_of(social_media(**{field: value})) == [
+        {"loc": ["platform_inputs", "Facebook", field], "msg": message}
+    ]
+
+
+def test_added_dcube_and_mi_fbm_messages():
+    assert errors_of(social_media(mi_fbm=False, added_dcube=None)) == [
+        {"loc": ["platform_inputs", "Facebook", "added_dcube"], "msg": "added_dcube must be specified if MI FBM is No."}
+    ]
+    assert errors_of(social_media(mi_fbm=None)) == [
+        {"loc": ["platform_inputs", "Facebook", "mi_fbm"], "msg": "mi_fbm is a required field."}
+    ]
+
+
+def test_mi_fbm_sets_added_dcube():
+    created = Create.model_validate(social_media(mi_fbm=True, added_dcube=None))
+    assert created.platform_inputs["Facebook"].added_dcube is True
+
+
+def test_missing_platform_inputs_message():
+    assert errors_of(payload(platform_inputs={})) == [
+        {"loc": ["platform_inputs"], "msg": "At least one platform input is required."}
+    ]
+
+
+def test_every_error_is_reported_at_once():
+    record = payload(personal_email="bad", zip_code=None)
+    del record["first_name"]
+    assert [error["loc"] for error in errors_of(record)] == [["first_name"], ["personal_email"], ["zip_code"]]
+
+
+def test_not_applicable_skips_agency_fields():
+    record = payload(not_applicable=True)
+    for field in AGENCY_FIELDS:
+        del record[field]
+    created = Create.model_validate(record)
+    assert created.not_applicable is True
+    assert created.agency_name is None
+
+
+def test_not_applicable_still_checks_given_formats():
+    record = payload(not_applicable=True, primary_email="bad")
+    assert errors_of(record) == [
+        {"loc": ["primary_email"], "msg": "Invalid email structure for bad. It should follow structure: user@example.com"}
+    ]
+
+
+@pytest.mark.parametrize("not_applicable", [False, None])
+def test_agency_fields_required_without_not_applicable(not_applicable):
+    record = payload(not_applicable=not_applicable)
+    del record["agency_name"]
+    assert errors_of(record) == [{"loc": ["agency_name"], "msg": "Missing 'agency_name' from 'AgencyInfo'"}]
+
+
+def test_validate_many_reports_a_bad_record_in_the_middle():
+    bad = payload(eid="")
+    results = validate_many([payload(eid="EID-A"), bad, payload(eid="EID-C")])
+    assert list(results) == [0, 1, 2]
+    assert isinstance(results[0], Create) and results[0].eid == "EID-A"
+    assert results[1] == (422, [{"loc": ["eid"], "msg": "Missing 'eid' from 'PersonalInfo'"}])
+    assert isinstance(results[2], Create) and results[2].eid == "EID-C"
+
+
+def test_validate_many_reports_type_errors_after_the_rules():
+    results = validate_many([payload(), payload(zip_code="not a number"), payload()])
+    status_code, detail = results[1]
+    assert status_code == 422
+    assert [error["loc"] for error in detail] == [("zip_code",)]
+    assert isinstance(results[0], Create) and isinstance(results[2], Create)